@@ -0,0 +1,41 @@
+"""Run all benchmarks and print their results as one JSON document.
+
+Every benchmark initializes NoneBot for itself, so each runs in its own process
+with its default arguments.
+
+Usage: `python -m benchmarks [name ...]`, e.g. `python -m benchmarks info matchers`
+"""
+import json
+import pkgutil
+import subprocess
+import sys
+from pathlib import Path
+
+
+def available() -> list:
+    return sorted(
+        x.name[len("bench_"):] for x in pkgutil.iter_modules([str(Path(__file__).parent)])
+        if x.name.startswith("bench_")
+    )
+
+
+def run(name: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-m", f"benchmarks.bench_{name}"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    if proc.returncode:
+        lines = proc.stderr.strip().splitlines() or [f"exited with code {proc.returncode}"]
+        return {"benchmark": name, "error": lines[-1]}
+    # NoneBot logs to stdout as well, the result is the indented JSON at the end
+    lines = proc.stdout.splitlines()
+    return json.loads("\n".join(lines[lines.index("{"):]))
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or available()
+    results = {}
+    for name in names:
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = run(name)
+    print(json.dumps(results, indent=2))
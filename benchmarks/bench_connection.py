@@ -0,0 +1,79 @@
+"""Request throughput and latency through the guest connection.
+
+Connects the guest to a local stand-in of the management host, which keeps
+`concurrency` requests in flight until `requests` requests of every operation
+are answered. Covers the whole path: encoding, `conn_loop`, the dispatcher,
+`_loop_process` and the reports.
+
+Usage: `python -m benchmarks.bench_connection [requests] [concurrency] [encoding]`
+"""
+import asyncio
+import json
+import sys
+import time
+
+from .fakes import FakeHost, free_port, init_nonebot, lifespan
+
+PORT = free_port()
+
+init_nonebot(guest_connection_hosturl=f"ws://127.0.0.1:{PORT}", guest_dispatch_inbox=1024)
+
+from nonebot_plugin_guestool.histogram import LatencyHistogram  # noqa: E402
+
+OPS = {
+    "/info/time": {},
+    "/info/python_version": {},
+    "/info/memory": {},
+    "/info/recv_events": {"since": 0},
+    "/action/matcher/list": {},
+    "/batch": {"ops": [{"opnm": "/info/time", "opct": {}}, {"opnm": "/info/memory", "opct": {}}]},
+}
+
+
+async def _run_op(host: FakeHost, opnm: str, opct: dict, requests: int, concurrency: int) -> dict:
+    hist = LatencyHistogram()
+    remaining = requests
+    errors = 0
+
+    async def client() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            begin = time.perf_counter_ns()
+            reply = await host.request(opnm, opct)
+            hist.record(time.perf_counter_ns() - begin)
+            content = reply["opct"]
+            errors += reply["opnm"] == "/event/reject" or isinstance(content, dict) and "error" in content
+
+    begin = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - begin
+    return {"requests_per_sec": requests / elapsed, "latency_ms": hist.summary(), "errors": errors}
+
+
+async def bench(requests: int, concurrency: int, encoding: str) -> dict:
+    host = FakeHost(PORT, encoding)
+    await host.start()
+    async with lifespan():
+        await asyncio.wait_for(host.connected.wait(), 10)
+        results = {}
+        for opnm, opct in OPS.items():
+            await _run_op(host, opnm, opct, min(requests, 50), concurrency)  # warm up
+            results[opnm] = await _run_op(host, opnm, opct, requests, concurrency)
+    await host.stop()
+    return {
+        "benchmark": "connection",
+        "requests": requests,
+        "concurrency": concurrency,
+        "encoding": host.codec.name,
+        "ops": results
+    }
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    print(json.dumps(asyncio.run(bench(
+        int(args[0]) if len(args) > 0 else 2000,
+        int(args[1]) if len(args) > 1 else 16,
+        args[2] if len(args) > 2 else "json"
+    )), indent=2))
@@ -0,0 +1,150 @@
+"""Latency of every info provider, with real and with mocked psutil.
+
+- `real`: the providers reading this machine, which is what a request costs here.
+- `mocked`: psutil returning fixed data of `disks` partitions and devices and
+  `processes` processes, which is the plugin's own overhead, comparable between
+  machines and growing with the number of items only.
+
+Sampling providers are called with a zero window, the ones backed by the
+background sampler are measured separately as `*_sampled`.
+
+Usage: `python -m benchmarks.bench_info [iterations] [disks] [processes]`
+"""
+import asyncio
+import json
+import sys
+import time
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Union
+from unittest.mock import patch
+
+from .fakes import init_nonebot, lifespan
+
+init_nonebot(guest_sampler_interval=.05)
+
+import psutil  # noqa: E402
+
+from nonebot_plugin_guestool import info  # noqa: E402
+from nonebot_plugin_guestool.histogram import LatencyHistogram  # noqa: E402
+
+_cpufreq = namedtuple("_cpufreq", "current min max")
+_mem = namedtuple("_mem", "total available used free percent")
+_part = namedtuple("_part", "device mountpoint fstype opts")
+_usage = namedtuple("_usage", "total used free percent")
+_diskio = namedtuple("_diskio", "read_count write_count read_bytes write_bytes")
+_netio = namedtuple("_netio", "bytes_sent bytes_recv packets_sent packets_recv")
+_meminfo = namedtuple("_meminfo", "rss vms")
+
+
+class _FakeProcess:
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+
+    @contextmanager
+    def oneshot(self) -> Iterator[None]:
+        yield
+
+    def name(self) -> str:
+        return f"proc{self.pid}"
+
+    def create_time(self) -> float:
+        return 1.7e9 + self.pid
+
+    def cpu_percent(self) -> float:
+        return self.pid % 100 / 10
+
+    def memory_info(self) -> _meminfo:
+        return _meminfo(self.pid * 4096, self.pid * 8192)
+
+
+@contextmanager
+def mocked_psutil(disks: int, processes: int) -> Iterator[None]:
+    """Replace the psutil calls of `info` with ones returning fixed data."""
+    gib = 1 << 30
+    fakes: Dict[str, Any] = {
+        "cpu_percent": lambda *a, **k: 12.5,
+        "cpu_count": lambda logical=True: 16 if logical else 8,
+        "cpu_freq": lambda *a, **k: _cpufreq(2400., 800., 4800.),
+        "getloadavg": lambda: (.5, .4, .3),
+        "virtual_memory": lambda: _mem(32 * gib, 20 * gib, 12 * gib, 18 * gib, 37.5),
+        "swap_memory": lambda: _mem(8 * gib, 7 * gib, gib, 7 * gib, 12.5),
+        "disk_partitions": lambda all=False: [
+            _part(f"/dev/sd{i}", f"/mnt/d{i}", "ext4", "rw") for i in range(disks)
+        ],
+        "disk_io_counters": lambda perdisk=False: {
+            f"sd{i}": _diskio(i, i, i * 4096, i * 8192) for i in range(disks)
+        },
+        "net_io_counters": lambda pernic=False: {
+            f"eth{i}": _netio(i * 1500, i * 3000, i, i) for i in range(disks)
+        },
+        "process_iter": lambda *a, **k: iter([_FakeProcess(i) for i in range(1, processes + 1)]),
+        "Process": _FakeProcess,
+    }
+    with ExitStack() as stack:
+        for name, fake in fakes.items():
+            stack.enter_context(patch.object(psutil, name, fake))
+        stack.enter_context(patch.object(
+            info._disk_usage, "_func", lambda mnt: _usage(100 * gib, 40 * gib, 60 * gib, 40.)
+        ))
+        yield
+
+
+PROVIDERS: Dict[str, Callable[[], Union[Any, Awaitable[Any]]]] = {
+    "python_version": info.info_python_version,
+    "time": info.info_time,
+    "cpu": lambda: info.info_cpu(0),
+    "memory": info.info_memory,
+    "partitions": lambda: info.info_all_partition(timeout=5),
+    "disk_io": lambda: info.info_all_disk_io(0),
+    "network_io": lambda: info.info_all_network_io(0),
+    "processes": lambda: info.info_processes(0),
+    "processes_top10": lambda: info.info_processes(0, sort="cpu", limit=10),
+    "system_platform": info.info_system_platform,
+}
+
+SAMPLED: Dict[str, Callable[[], Union[Any, Awaitable[Any]]]] = {
+    "cpu_sampled": info.info_cpu,
+    "disk_io_sampled": info.info_all_disk_io,
+    "network_io_sampled": info.info_all_network_io,
+    "metrics_history": lambda: info.info_metrics_history(20),
+}
+
+
+async def _measure(provider: Callable[[], Any], iterations: int) -> dict:
+    hist = LatencyHistogram()
+    size = 0
+    for _ in range(iterations):
+        begin = time.perf_counter_ns()
+        result = provider()
+        if asyncio.iscoroutine(result) or isinstance(result, asyncio.Future):
+            result = await result
+        hist.record(time.perf_counter_ns() - begin)
+        size = len(result) if isinstance(result, list) else 1
+    return {"latency_ms": hist.summary(), "items": size}
+
+
+async def _measure_all(providers: Dict[str, Callable[[], Any]], iterations: int) -> dict:
+    return {name: await _measure(func, iterations) for name, func in providers.items()}
+
+
+async def bench(iterations: int, disks: int, processes: int) -> dict:
+    async with lifespan():
+        # let the background sampler record a few windows
+        await asyncio.sleep(.2)
+        real = await _measure_all({**PROVIDERS, **SAMPLED}, iterations)
+        with mocked_psutil(disks, processes):
+            mocked = await _measure_all(PROVIDERS, iterations)
+    return {
+        "benchmark": "info",
+        "iterations": iterations,
+        "mocked_disks": disks,
+        "mocked_processes": processes,
+        "real": real,
+        "mocked": mocked
+    }
+
+
+if __name__ == "__main__":
+    args = [int(x) for x in sys.argv[1:4]]
+    print(json.dumps(asyncio.run(bench(*args, *(200, 16, 500)[len(args):])), indent=2))
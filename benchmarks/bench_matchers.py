@@ -0,0 +1,122 @@
+"""Matcher introspection and hacking with thousands of matchers.
+
+For every size, registers synthetic matchers (defined in a loop, like plugins
+generating them) with startswith, endswith, fullmatch and regex rules
+over 50 priorities, then measures:
+
+- `register`: giving IDs to all unregistered matchers (the first `list`).
+- `list`, `get` (cold and cached), `dump` pages (cold and cached) and a filtered
+  `dump` scanning every matcher.
+- `hack`: changing one matcher, and `hack_many`: one atomic batch of changes.
+
+Usage: `python -m benchmarks.bench_matchers [sizes] [samples]`, e.g. `1000,10000 200`
+"""
+import json
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from .fakes import init_nonebot
+
+init_nonebot()
+
+from nonebot import (  # noqa: E402
+    on_endswith,
+    on_fullmatch,
+    on_regex,
+    on_startswith,
+)
+from nonebot.matcher import matchers  # noqa: E402
+
+from nonebot_plugin_guestool.histogram import LatencyHistogram  # noqa: E402
+from nonebot_plugin_guestool.runtime import (  # noqa: E402
+    dump_matchers,
+    get_matcher_data,
+    hack_matcher_by_id,
+    hack_matchers_by_id,
+    list_all_matchers,
+)
+from nonebot_plugin_guestool.runtime.matcher import matcher_data_cache  # noqa: E402
+
+PRIORITIES = 50
+
+_makers = (
+    lambda i: on_startswith(f"start{i} ", priority=i % PRIORITIES, block=False),
+    lambda i: on_endswith(f" end{i}", priority=i % PRIORITIES, block=False),
+    lambda i: on_fullmatch(f"full{i}", priority=i % PRIORITIES, block=False),
+    lambda i: on_regex(rf"^roll{i} (\d+)d(\d+)$", priority=i % PRIORITIES, block=False),
+)
+
+
+def grow_matchers(total: int) -> None:
+    count = sum(len(x) for x in matchers.values())
+    for i in range(count, total):
+        _makers[i % len(_makers)](i)
+
+
+def _timed(func: Callable[[], Any], times: int = 1) -> dict:
+    hist = LatencyHistogram()
+    for _ in range(times):
+        begin = time.perf_counter_ns()
+        func()
+        hist.record(time.perf_counter_ns() - begin)
+    return hist.summary()  # type: ignore[return-value]
+
+
+def _each(func: Callable[[str], Any], ids: List[str]) -> dict:
+    hist = LatencyHistogram()
+    for id in ids:
+        begin = time.perf_counter_ns()
+        func(id)
+        hist.record(time.perf_counter_ns() - begin)
+    return hist.summary()  # type: ignore[return-value]
+
+
+def _moved(id: str) -> Dict[str, Any]:
+    data = dict(get_matcher_data(id))
+    data["priority"] = (data["priority"] + 1) % PRIORITIES
+    return data
+
+
+def bench_size(size: int, samples: int) -> dict:
+    grow_matchers(size)
+    rnd = random.Random(size)
+    results: Dict[str, Any] = {"matchers": size}
+
+    begin = time.perf_counter()
+    ids = list_all_matchers()
+    results["register_ms"] = (time.perf_counter() - begin) * 1e3
+    results["list"] = _timed(list_all_matchers, 20)
+
+    sample = rnd.sample(ids, min(samples, len(ids)))
+    matcher_data_cache.clear()
+    results["get_cold"] = _each(get_matcher_data, sample)
+    results["get_cached"] = _each(get_matcher_data, sample)
+
+    middle = size // 2
+    matcher_data_cache.clear()
+    results["dump_page_cold"] = _timed(lambda: dump_matchers(middle, 100))
+    results["dump_page_cached"] = _timed(lambda: dump_matchers(middle, 100), 20)
+    results["dump_filtered"] = _timed(lambda: dump_matchers(plugin_name="nonexistent"), 20)
+    results["dump_all_ms"] = _timed(lambda: dump_matchers(limit=0))["max"]
+
+    results["hack"] = _each(lambda id: hack_matcher_by_id(id, _moved(id)), sample)
+    changes = [{"id": id, **_moved(id)} for id in sample]
+    results["hack_many_ms"] = _timed(lambda: hack_matchers_by_id(changes))["max"]
+    results["hack_many_changes"] = len(changes)
+    return results
+
+
+def bench(sizes: List[int], samples: int) -> dict:
+    return {
+        "benchmark": "matchers",
+        "samples": samples,
+        "sizes": [bench_size(size, samples) for size in sorted(sizes)]
+    }
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    sizes = [int(x) for x in args[0].split(",")] if len(args) > 0 else [1000, 10000]
+    print(json.dumps(bench(sizes, int(args[1]) if len(args) > 1 else 200), indent=2))
@@ -0,0 +1,56 @@
+"""Events/sec of NoneBot's event handling with the two ways of counting events.
+
+- `matcher`: the former priority-0 matcher calling `add_recv` for every event.
+- `preprocess`: the current hook in the event preprocessing step.
+
+Usage: `python -m benchmarks.bench_recv_count [events]`
+"""
+import asyncio
+import json
+import sys
+import time
+
+from .fakes import FakeEvent, init_nonebot, make_bot
+
+init_nonebot()
+
+import nonebot.message  # noqa: E402
+from nonebot import on  # noqa: E402
+from nonebot.matcher import matchers  # noqa: E402
+
+from nonebot_plugin_guestool.runtime import runtime  # noqa: E402
+
+
+async def _run(events: int) -> float:
+    bot = make_bot()
+    event = FakeEvent()
+    begin = time.perf_counter()
+    for _ in range(events):
+        await nonebot.message.handle_event(bot, event)
+    return events / (time.perf_counter() - begin)
+
+
+async def bench(events: int) -> dict:
+    results = {}
+
+    recv_matcher = on(handlers=[runtime.add_recv], priority=0, block=False)
+    results["matcher"] = await _run(events)
+    recv_matcher.destroy()
+    if not matchers[0]:
+        del matchers[0]
+
+    await runtime.patch_event_counting()
+    results["preprocess"] = await _run(events)
+    nonebot.message._apply_event_preprocessors = runtime._orig_apply_event_preprocessors
+
+    assert runtime.recv_num["10000"]["FakeEvent"] == events * 2
+    return {
+        "benchmark": "recv_count",
+        "events": events,
+        "events_per_sec": results,
+        "speedup": results["preprocess"] / results["matcher"]
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)), indent=2))
@@ -0,0 +1,120 @@
+"""Rule checks per event and events/sec with and without the routing index.
+
+Registers `matchers` message matchers with startswith, endswith, fullmatch,
+keywords, command and regex rules, then sends a mix of messages where most match at
+most one of them.
+
+- `plain`: NoneBot checking the rule of every matcher.
+- `routed`: the routing index skipping matchers which cannot match.
+
+Usage: `python -m benchmarks.bench_routing [matchers] [events]`
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+from .fakes import FakeMessageEvent, init_nonebot, make_bot
+
+init_nonebot()
+
+import nonebot.message  # noqa: E402
+from nonebot import (  # noqa: E402
+    on_command,
+    on_endswith,
+    on_fullmatch,
+    on_keyword,
+    on_regex,
+    on_startswith,
+)
+from nonebot.matcher import Matcher  # noqa: E402
+
+from nonebot_plugin_guestool.runtime import routing  # noqa: E402
+
+evaluated = 0
+handled = 0
+
+
+async def _counted_check_rule(cls, *args, **kwargs) -> bool:
+    global evaluated
+    evaluated += 1
+    return await _orig_check_rule(cls, *args, **kwargs)
+
+_orig_check_rule = routing._orig_check_rule
+
+
+async def _handle() -> None:
+    global handled
+    handled += 1
+
+
+def make_matchers(n: int) -> None:
+    makers = (
+        lambda i: on_startswith(f"start{i} ", block=False),
+        lambda i: on_endswith(f" end{i}", block=False),
+        lambda i: on_fullmatch(f"full{i}", block=False),
+        lambda i: on_fullmatch(f"Full{i}", ignorecase=True, block=False),
+        lambda i: on_keyword({f"kw{i}x"}, block=False),
+        lambda i: on_command(f"cmd{i}", block=False),
+        lambda i: on_regex(rf"^roll{i} (\d+)d(\d+)$", block=False),
+        lambda i: on_regex(rf"(?:weather|forecast) in city{i}\b", block=False),
+    )
+    for i in range(n):
+        makers[i % len(makers)](i).append_handler(_handle)
+
+
+def make_texts(n: int, events: int) -> list:
+    rnd = random.Random(42)
+    forms = (
+        "start{} hello", "hello end{}", "full{}", "FULL{}", "blah kw{}x blah", "/cmd{} arg",
+        "roll{} 2d6", "forecast in city{}",
+        "just chatting {}", "nothing to see here {}",
+    )
+    return [rnd.choice(forms).format(rnd.randrange(n)) for _ in range(events)]
+
+
+async def _run(texts: list) -> dict:
+    global evaluated, handled
+    evaluated = handled = 0
+    bot = make_bot()
+    events = [FakeMessageEvent(text=x) for x in texts]
+    begin = time.perf_counter()
+    for event in events:
+        await nonebot.message.handle_event(bot, event)
+    elapsed = time.perf_counter() - begin
+    return {
+        "events_per_sec": len(events) / elapsed,
+        "rule_checks_per_event": evaluated / len(events),
+        "handled": handled
+    }
+
+
+async def bench(nmatchers: int, events: int) -> dict:
+    make_matchers(nmatchers)
+    texts = make_texts(nmatchers, events)
+
+    Matcher.check_rule = classmethod(_counted_check_rule)
+    plain = await _run(texts)
+
+    routing._orig_check_rule = _counted_check_rule
+    routing.enable_routing()
+    routed = await _run(texts)
+    routing.disable_routing()
+    Matcher.check_rule = classmethod(_orig_check_rule)
+
+    assert plain["handled"] == routed["handled"], "routing changed which matchers ran"
+    return {
+        "benchmark": "routing",
+        "matchers": nmatchers,
+        "events": events,
+        "plain": plain,
+        "routed": routed,
+        "index": routing.routing_index.stats(),
+        "speedup": routed["events_per_sec"] / plain["events_per_sec"]
+    }
+
+
+if __name__ == "__main__":
+    args = [int(x) for x in sys.argv[1:3]]
+    print(json.dumps(asyncio.run(bench(*args, *(300, 500)[len(args):])), indent=2))
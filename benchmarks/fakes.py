@@ -0,0 +1,161 @@
+"""Offline stand-ins for NoneBot adapters, bots, events and the management host
+used by the benchmarks."""
+import asyncio
+import json
+import socket
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+import nonebot
+import websockets
+from nonebot.adapters import Adapter, Bot, Event, Message, MessageSegment
+from websockets.server import WebSocketServerProtocol
+
+
+def init_nonebot(**config: Any) -> None:
+    """Initialize NoneBot without a real driver and load this plugin."""
+    nonebot.init(driver="~none", log_level="WARNING", **config)
+    nonebot.load_plugin("nonebot_plugin_guestool")
+
+
+def lifespan() -> Any:
+    """Startup and shutdown hooks of the driver, as an async context manager."""
+    return nonebot.get_driver()._lifespan
+
+
+class FakeSegment(MessageSegment["FakeMessage"]):
+    @classmethod
+    def get_message_class(cls):
+        return FakeMessage
+
+    def __str__(self) -> str:
+        return self.data["text"] if self.type == "text" else f"[{self.type}]"
+
+    def is_text(self) -> bool:
+        return self.type == "text"
+
+
+class FakeMessage(Message[FakeSegment]):
+    @classmethod
+    def get_segment_class(cls):
+        return FakeSegment
+
+    @staticmethod
+    def _construct(msg: str):
+        yield FakeSegment("text", {"text": msg})
+
+
+class FakeAdapter(Adapter):
+    @classmethod
+    def get_name(cls) -> str:
+        return "Fake"
+
+    async def _call_api(self, bot: Bot, api: str, **data: Any) -> Any:
+        return None
+
+
+class FakeBot(Bot):
+    async def send(self, event: Event, message: Any, **kwargs: Any) -> Any:
+        return None
+
+
+class FakeEvent(Event):
+    type: str = "notice"
+
+    def get_type(self) -> str:
+        return self.type
+
+    def get_event_name(self) -> str:
+        return self.type
+
+    def get_event_description(self) -> str:
+        return self.type
+
+    def get_log_string(self) -> str:
+        return self.type
+
+    def get_user_id(self) -> str:
+        return "10000"
+
+    def get_session_id(self) -> str:
+        return "10000"
+
+    def get_message(self) -> FakeMessage:
+        raise ValueError("not a message event")
+
+    def is_tome(self) -> bool:
+        return False
+
+
+class FakeMessageEvent(FakeEvent):
+    type: str = "message"
+    text: str = ""
+    to_me: bool = False
+
+    def get_message(self) -> FakeMessage:
+        return FakeMessage(self.text)
+
+    def is_tome(self) -> bool:
+        return self.to_me
+
+
+def make_bot(self_id: str = "10000", adapter: Optional[FakeAdapter] = None) -> FakeBot:
+    adapter = adapter or FakeAdapter(nonebot.get_driver())
+    return FakeBot(adapter, self_id)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeHost:
+    """Local stand-in of the management host (see `test-host-server`) for one guest.
+
+    Answers the greeting with the given encoding, then sends requests and matches
+    the guest's reports to them by `opid`.
+    """
+
+    def __init__(self, port: int, encoding: str = "json") -> None:
+        # the plugin can only be imported after NoneBot is initialized
+        from nonebot_plugin_guestool.codec import get_codec
+
+        self.port = port
+        self.encoding = encoding
+        self.codec = get_codec("json")
+        self.connected = asyncio.Event()
+        self._ws: Optional[WebSocketServerProtocol] = None
+        self._server: Any = None
+        self._pending: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+
+    async def start(self) -> None:
+        self._server = await websockets.serve(self._serve, "127.0.0.1", self.port)
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve(self, ws: WebSocketServerProtocol) -> None:
+        from nonebot_plugin_guestool.codec import decode_frame, get_codec
+
+        hello = json.loads(await ws.recv())
+        self.codec = get_codec(
+            self.encoding if self.encoding in hello["opct"].get("encodings", []) else "json"
+        )
+        await ws.send(json.dumps(
+            {"opid": hello["opid"], "opnm": "/greet/hello", "opct": {"encoding": self.codec.name}}
+        ))
+        self._ws = ws
+        self.connected.set()
+        async for frame in ws:
+            data = decode_frame(self.codec, frame)
+            if (fut := self._pending.pop(data["opid"], None)) and not fut.done():
+                fut.set_result(data)
+
+    async def request(self, opnm: str, opct: Dict[str, Any]) -> Dict[str, Any]:
+        assert self._ws
+        opid = str(uuid4())
+        fut = self._pending[opid] = asyncio.get_running_loop().create_future()
+        await self._ws.send(self.codec.dumps({"opid": opid, "opnm": opnm, "opct": opct}))
+        return await fut
@@ -0,0 +1,48 @@
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from nonebot import get_loaded_plugins
+
+
+class PluginResolver:
+    """Plugin (and module) names of source files, by the location of the loaded plugins.
+
+    Built from the plugins and modules loaded at creation, create a new one to pick
+    up ones loaded later.
+    """
+
+    def __init__(self) -> None:
+        roots: List[Tuple[str, str]] = []
+        for plugin in get_loaded_plugins():
+            file = getattr(plugin.module, "__file__", None)
+            if not file:
+                continue
+            file = os.path.normcase(os.path.abspath(file))
+            if os.path.basename(file).startswith("__init__."):
+                # a package plugin owns its whole directory
+                roots.append((os.path.dirname(file) + os.sep, plugin.name))
+            else:
+                roots.append((file, plugin.name))
+        # nested plugins first
+        roots.sort(key=lambda x: len(x[0]), reverse=True)
+        self._roots = roots
+        self._cache: Dict[str, Optional[str]] = {}
+        self._modules: Optional[Dict[str, str]] = None
+
+    def __call__(self, filename: str) -> Optional[str]:
+        if (name := self._cache.get(filename, ...)) is not ...:
+            return name  # type: ignore[return-value]
+        path = os.path.normcase(os.path.abspath(filename))
+        name = next((name for root, name in self._roots if path.startswith(root)), None)
+        self._cache[filename] = name
+        return name
+
+    def module(self, filename: str) -> Optional[str]:
+        """Name of the loaded module whose source is `filename`."""
+        if self._modules is None:
+            self._modules = {}
+            for name, mod in list(sys.modules.items()):
+                if file := getattr(mod, "__file__", None):
+                    self._modules[os.path.normcase(os.path.abspath(file))] = name
+        return self._modules.get(os.path.normcase(os.path.abspath(filename)))
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import time
+from inspect import isawaitable
+from typing import Any, Callable, Dict, Mapping, Tuple
+
+from .typing import CoalesceInfoDict, CoalesceStatDict
+
+_Key = Tuple[str, str]
+
+
+class _InFlight:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: "asyncio.Future[Any]") -> None:
+        self.future = future
+        self.waiters = 0
+
+
+class InfoCoalescer:
+    """Single-flight runner for info operations.
+
+    Identical requests (same op name and canonicalized parameters) arriving while one
+    is still running attach to the running computation instead of starting another.
+    Results can optionally be kept for a short per-op TTL to serve requests arriving
+    right after the computation finished.
+    """
+
+    def __init__(self, ttl: Dict[str, float]) -> None:
+        self.ttl = ttl
+        self._inflight: Dict[_Key, _InFlight] = {}
+        self._cache: Dict[_Key, Tuple[float, Any]] = {}
+        self._stats: Dict[str, CoalesceStatDict] = {}
+
+    @staticmethod
+    def _make_key(name: str, params: Mapping[str, Any]) -> _Key:
+        return name, json.dumps(params, sort_keys=True, separators=(",", ":"), default=repr)
+
+    def _stat(self, name: str) -> CoalesceStatDict:
+        if name not in self._stats:
+            self._stats[name] = {"hits": 0, "misses": 0, "cache_hits": 0}
+        return self._stats[name]
+
+    @staticmethod
+    async def _call(func: Callable[..., Any], params: Mapping[str, Any]) -> Any:
+        res = func(**params)
+        if isawaitable(res):
+            res = await res
+        return res
+
+    def _finish(self, key: _Key, future: "asyncio.Future[Any]") -> None:
+        self._inflight.pop(key, None)
+        now = time.monotonic()
+        for k in [k for k, (exp, _) in self._cache.items() if exp <= now]:
+            del self._cache[k]
+        ttl = self.ttl.get(key[0], 0)
+        if ttl > 0 and not future.cancelled() and future.exception() is None:
+            self._cache[key] = (now + ttl, future.result())
+
+    async def run(self, name: str, params: Mapping[str, Any], func: Callable[..., Any]) -> Any:
+        key = self._make_key(name, params)
+        stat = self._stat(name)
+
+        if (cached := self._cache.get(key)) is not None:
+            if cached[0] > time.monotonic():
+                stat["cache_hits"] += 1
+                return cached[1]
+            del self._cache[key]
+
+        entry = self._inflight.get(key)
+        if entry is None:
+            stat["misses"] += 1
+            entry = _InFlight(asyncio.ensure_future(self._call(func, params)))
+            entry.future.add_done_callback(lambda f: self._finish(key, f))
+            self._inflight[key] = entry
+        else:
+            stat["hits"] += 1
+
+        entry.waiters += 1
+        try:
+            return await asyncio.shield(entry.future)
+        finally:
+            entry.waiters -= 1
+            # nobody is waiting for the result any more
+            if not entry.waiters and not entry.future.done():
+                entry.future.cancel()
+
+    def cancel_all(self) -> None:
+        for entry in list(self._inflight.values()):
+            entry.future.cancel()
+        self._cache.clear()
+
+    def stats(self) -> CoalesceInfoDict:
+        """Coalesce hit/miss counts per info op"""
+        now = time.monotonic()
+        return {
+            "ops": self._stats,
+            "inflight": len(self._inflight),
+            "cached": sum(1 for exp, _ in self._cache.values() if exp > now)
+        }
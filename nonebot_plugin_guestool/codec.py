@@ -0,0 +1,57 @@
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Union
+
+Frame = Union[str, bytes]
+
+
+class Codec(NamedTuple):
+    name: str
+    dumps: Callable[[Any], Frame]
+    loads: Callable[[Frame], Any]
+
+
+def _json_dumps(obj: Any) -> str:
+    return json.dumps(obj)
+
+
+json_codec = Codec("json", _json_dumps, json.loads)
+
+codecs: Dict[str, Codec] = {}
+"""All available wire encodings, in the guest's order of preference."""
+
+try:
+    import msgpack
+except ImportError:
+    pass
+else:
+    codecs["msgpack"] = Codec(
+        "msgpack",
+        lambda obj: msgpack.packb(obj, use_bin_type=True),
+        lambda frame: msgpack.unpackb(frame, raw=False)
+    )
+
+try:
+    import cbor2
+except ImportError:
+    pass
+else:
+    codecs["cbor"] = Codec("cbor", cbor2.dumps, cbor2.loads)
+
+codecs["json"] = json_codec
+
+
+def supported_encodings(preferred: List[str]) -> List[str]:
+    """Encodings to advertise in `/greet/hello`, filtered by availability."""
+    return [x for x in preferred if x in codecs] or ["json"]
+
+
+def get_codec(name: Any) -> Codec:
+    """Codec picked by the host, or JSON if the host picked nothing usable."""
+    return codecs.get(name, json_codec) if isinstance(name, str) else json_codec
+
+
+def decode_frame(codec: Codec, frame: Frame) -> Any:
+    """Decode a received frame. Text frames are always JSON for compatibility."""
+    if isinstance(frame, str):
+        return json.loads(frame)
+    return codec.loads(frame)
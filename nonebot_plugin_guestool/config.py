@@ -1,6 +1,74 @@
+from typing import Dict, List
+
 from pydantic import BaseModel, Extra
 
 
 class Config(BaseModel, extra=Extra.ignore):
     guest_connection_hosturl: str = ""
-    """主机侧 WebSocket 连接地址，只应由主机侧通过环境变量设置。"""
\ No newline at end of file
+    """主机侧 WebSocket 连接地址，只应由主机侧通过环境变量设置。"""
+
+    guest_reconnect_base_delay: float = 1
+    """断开或连接失败后首次重连的等待时间（秒），之后每次翻倍，并加入随机抖动。"""
+
+    guest_reconnect_max_delay: float = 60
+    """重连等待时间的上限（秒）。"""
+
+    guest_replay_buffer: int = 256
+    """断线重连恢复会话时可重放的未确认消息数量上限。"""
+
+    guest_connection_encodings: List[str] = ["msgpack", "cbor", "json"]
+    """握手时向主机侧声明的消息编码，按优先顺序排列，未安装的编码会被忽略。"""
+
+    guest_sampler_interval: float = 0
+    """后台指标采样间隔（秒），小于等于 0 时不启用后台采样。"""
+
+    guest_sampler_size: int = 60
+    """后台指标采样保留的最近样本数量。"""
+
+    guest_probe_workers: int = 4
+    """执行阻塞探测（如进程信息）的线程数量，磁盘占用探测另用同样数量的线程。"""
+
+    guest_probe_timeout: float = 2
+    """单个挂载点磁盘占用探测的超时时间（秒）。"""
+
+    guest_info_cache_ttl: Dict[str, float] = {}
+    """各信息操作结果的缓存时长（秒），如 `{"processes": 1.0}`，未列出的操作不缓存。"""
+
+    guest_subscription_min_interval: float = 0.5
+    """订阅推送的最小间隔（秒）。"""
+
+    guest_subscription_limit: int = 32
+    """单个连接上同时存在的订阅数量上限。"""
+
+    guest_dispatch_workers: int = 8
+    """同时处理主机侧请求的工作协程数量。"""
+
+    guest_dispatch_inbox: int = 64
+    """等待处理的主机侧请求数量上限。"""
+
+    guest_dispatch_reject_when_full: bool = False
+    """等待队列已满时是否直接以 `busy` 拒绝新请求，否则暂停接收直到队列有空位。"""
+
+    guest_message_expiry: float = 60
+    """主机侧请求自发送起的过期时间（秒），过期的请求将被拒绝，仍在运行的请求将被取消。"""
+
+    guest_routing_index: bool = False
+    """是否启用消息路由索引，按规则中的字面量（前缀、后缀、完整匹配、关键词、命令）跳过不可能匹配的事件响应器的规则检查。"""
+
+    guest_routing_regex: bool = True
+    """消息路由索引是否也按正则表达式中必需出现的字面量跳过正则规则检查。"""
+
+    guest_profile_max_duration: float = 60
+    """单次性能分析会话的最长时间（秒），到时自动停止。"""
+
+    guest_memory_max_frames: int = 5
+    """内存分配追踪保留的调用栈帧数上限，帧数越多开销越大。"""
+
+    guest_memory_max_snapshots: int = 4
+    """保留的内存快照数量上限，超出时丢弃最早的快照。"""
+
+    guest_loop_monitor_interval: float = 0
+    """事件循环延迟探测的心跳间隔（秒，如 0.05），小于等于 0 时不启用事件循环监测。"""
+
+    guest_loop_slow_threshold: float = 0.1
+    """事件循环被阻塞超过此时长（秒）时记为慢回调，并记录阻塞事件循环的代码。"""
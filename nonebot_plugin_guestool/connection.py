@@ -2,36 +2,56 @@ import asyncio
 import json
 from contextlib import suppress
 from inspect import isawaitable
-from typing import Optional
+from typing import Any, Dict, List, Mapping, Optional, Union
 from uuid import uuid4
 
 from nonebot import get_driver, logger
 from websockets.client import WebSocketClientProtocol, connect
-from websockets.exceptions import ConnectionClosed
+from websockets.exceptions import ConnectionClosed, InvalidHandshake, InvalidURI
 
+from .coalesce import InfoCoalescer
+from .codec import Codec, decode_frame, get_codec, json_codec, supported_encodings
 from .config import Config
+from .dispatcher import Dispatcher
 from .info import (
     info_all_disk_io,
     info_all_network_io,
     info_all_partition,
     info_cpu,
     info_memory,
+    info_metrics_history,
     info_processes,
     info_python_version,
     info_system_platform,
     info_time,
 )
 from .runtime import (
+    dump_matchers,
     get_matcher_data,
     hack_matcher_by_id,
+    hack_matchers_by_id,
     info_apicall,
     info_bots,
     info_bots_connect_time,
+    info_matcher_latency,
     info_recv_events,
+    info_routing,
     list_all_matchers,
     remove_matcher_by_id,
 )
-from .typing import ConnectionMessageDict
+from .loopmonitor import loop_monitor
+from .memory import memory_tracer
+from .profiler import profiler
+from .session import ReplayBuffer, backoff_delays
+from .subscription import SubscriptionManager
+from .typing import (
+    BatchItemResultDict,
+    BatchReportDict,
+    ConnectionMessageDict,
+    ErrorReportDict,
+    RejectReportDict,
+    SubscribeReportDict,
+)
 
 driver = get_driver()
 
@@ -40,9 +60,16 @@ lconfig = Config(**driver.config.dict())
 # 为避免检查器解析错误使用此变量名。
 
 conn: Optional[WebSocketClientProtocol] = None
+conn_codec: Codec = json_codec
 conn_task: Optional[asyncio.Task] = None
-_conn_restart_task: Optional[asyncio.Task] = None
-_conn_queue: asyncio.Queue[asyncio.Task] = asyncio.Queue()
+_conn_ready = False
+"""连接已建立且重放完成，可以直接发送消息。"""
+
+replay = ReplayBuffer(lconfig.guest_replay_buffer)
+"""当前会话中主机侧尚未确认的消息。"""
+
+coalescer = InfoCoalescer(lconfig.guest_info_cache_ttl)
+"""合并相同的并发信息请求。"""
 
 info_funcs = {
     "python_version": info_python_version,
@@ -51,6 +78,7 @@ info_funcs = {
     "all_partitions": info_all_partition,
     "all_disk_io": info_all_disk_io,
     "all_network_io": info_all_network_io,
+    "metrics_history": info_metrics_history,
     "processes": info_processes,
     "system_platform": info_system_platform,
     "time": info_time,
@@ -58,101 +86,325 @@ info_funcs = {
     "bots_connect_time": info_bots_connect_time,
     "recv_events": info_recv_events,
     "apicall": info_apicall,
+    "matcher_latency": info_matcher_latency,
+    "routing": info_routing,
+    "coalesce": coalescer.stats,
+    "event_loop": loop_monitor.stats,
 }
 
 action_funcs = {
     "matcher/list": list_all_matchers,
     "matcher/info": get_matcher_data,
+    "matcher/dump": dump_matchers,
     "matcher/hack": hack_matcher_by_id,
-    "matcher/remove": remove_matcher_by_id
+    "matcher/hack_many": hack_matchers_by_id,
+    "matcher/remove": remove_matcher_by_id,
+    "profile/start": profiler.start,
+    "profile/stop": profiler.stop,
+    "profile/raw": profiler.read_raw,
+    "memory/start": memory_tracer.start,
+    "memory/stop": memory_tracer.stop,
+    "memory/snapshot": memory_tracer.snapshot,
+    "memory/diff": memory_tracer.diff
 }
 
 
+async def send_message(data: ConnectionMessageDict) -> None:
+    """Send a report, or keep it for replaying if currently disconnected."""
+    replay.push(data)
+    if not (conn and _conn_ready):
+        return
+    with suppress(ConnectionClosed):
+        await conn.send(conn_codec.dumps(data))
+
+
+async def reject_message(data: ConnectionMessageDict, reason: str) -> None:
+    await send_message(
+        ConnectionMessageDict(
+            opid=data["opid"],
+            opnm="/event/reject",
+            opct=RejectReportDict(opnm=data["opnm"], reason=reason)
+        )
+    )
+
+
+async def _run_info(name: str, params: Mapping[str, Any]) -> Any:
+    return await coalescer.run(name, params, info_funcs[name])
+
+
+async def _run_action(name: str, params: Mapping[str, Any]) -> Any:
+    res = action_funcs[name](**params)
+    if isawaitable(res):
+        res = await res
+    return res
+
+
+async def _run_batch_item(item: Dict[str, Any]) -> BatchItemResultDict:
+    opnm = item.get("opnm", "")
+    try:
+        if opnm.startswith("/info/"):
+            res = await _run_info(opnm[6:], item.get("opct", {}))
+        elif opnm.startswith("/action/"):
+            res = await _run_action(opnm[8:], item.get("opct", {}))
+        else:
+            raise ValueError(f"operation {opnm!r} is not allowed in batch")
+    except Exception as e:
+        logger.opt(exception=e).debug(f"Batch operation {opnm!r} failed")
+        return {"opnm": opnm, "result": None, "error": f"{e.__class__.__name__}: {e}"}
+    return {"opnm": opnm, "result": res, "error": None}
+
+
+async def run_batch(ops: List[Dict[str, Any]]) -> BatchReportDict:
+    """Run info/action operations concurrently, results are in the same order."""
+    return {"results": await asyncio.gather(*(_run_batch_item(x) for x in ops))}
+
+
+subscriptions = SubscriptionManager(
+    _run_info,
+    send_message,
+    lconfig.guest_subscription_min_interval,
+    lconfig.guest_subscription_limit
+)
+"""当前连接上的订阅，断开连接时全部取消。"""
+
+
+def subscribe(name: str, interval: float, params: Dict[str, Any]) -> SubscribeReportDict:
+    if name not in info_funcs:
+        raise KeyError(name)
+    sub = subscriptions.subscribe(name, interval, params)
+    return {"sbid": sub.id, "interval": sub.interval}
+
+
 async def _loop_process(data: ConnectionMessageDict):
-    assert conn
-    if data["opnm"] == "/greet/bye":
-        await conn.send(json.dumps(data))
-        await conn.close()
-    elif data["opnm"].startswith("/info"):
+    if data["opnm"] == "/batch":
+        await send_message(
+            ConnectionMessageDict(
+                opid=data["opid"],
+                opnm="/event/report/batch",
+                opct=await run_batch(data["opct"].get("ops", []))
+            )
+        )
+    elif data["opnm"].startswith("/subscribe/"):
+        res: Union[SubscribeReportDict, ErrorReportDict]
         try:
-            res = info_funcs[data["opnm"][6:]](**data["opct"])
-            if isawaitable(res):
-                res = await res
+            res = subscribe(
+                data["opnm"][11:],
+                data["opct"].get("interval", 1.),
+                data["opct"].get("params", {})
+            )
         except KeyError as e:
             res = {"error": "unknown info type"}
             logger.opt(exception=e).warning("Received a wrong info type from server!")
-        await conn.send(
-            json.dumps(
-                ConnectionMessageDict(
-                    opid=data["opid"], opnm="/event/report/info", opct=res
-                )
+        except ValueError as e:
+            res = {"error": str(e)}
+        await send_message(
+            ConnectionMessageDict(
+                opid=data["opid"], opnm="/event/report/subscribe", opct=res
+            )
+        )
+    elif data["opnm"] == "/unsubscribe":
+        await send_message(
+            ConnectionMessageDict(
+                opid=data["opid"],
+                opnm="/event/report/unsubscribe",
+                opct={"removed": subscriptions.unsubscribe(data["opct"].get("sbid"))}
+            )
+        )
+    elif data["opnm"].startswith("/info"):
+        name = data["opnm"][6:]
+        if name not in info_funcs:
+            res = {"error": "unknown info type"}
+            logger.warning(f"Received a wrong info type {name!r} from server!")
+        else:
+            try:
+                res = await _run_info(name, data["opct"])
+            except Exception as e:
+                res = {"error": f"{e.__class__.__name__}: {e}"}
+                logger.opt(exception=e).warning(f"Info {name!r} failed")
+        await send_message(
+            ConnectionMessageDict(
+                opid=data["opid"], opnm="/event/report/info", opct=res
             )
         )
     elif data["opnm"].startswith("/action"):
-        try:
-            res = info_funcs[data["opnm"][8:]](**data["opct"])
-            if isawaitable(res):
-                res = await res
-        except KeyError as e:
+        name = data["opnm"][8:]
+        if name not in action_funcs:
             res = {"error": "unknown action type"}
-            logger.opt(exception=e).warning("Received a wrong action type from server!")
-        await conn.send(
-            json.dumps(
-                ConnectionMessageDict(
-                    opid=data["opid"], opnm="/event/report/action", opct=res
-                )
+            logger.warning(f"Received a wrong action type {name!r} from server!")
+        else:
+            try:
+                res = await _run_action(name, data["opct"])
+            except Exception as e:
+                # report like `/batch` does, or the host waits for a reply forever
+                res = {"error": f"{e.__class__.__name__}: {e}"}
+                logger.opt(exception=e).warning(f"Action {name!r} failed")
+        await send_message(
+            ConnectionMessageDict(
+                opid=data["opid"], opnm="/event/report/action", opct=res
             )
         )
 
 
-async def conn_loop():
+dispatcher = Dispatcher(
+    _loop_process,
+    reject_message,
+    lconfig.guest_dispatch_workers,
+    lconfig.guest_dispatch_inbox,
+    lconfig.guest_message_expiry
+)
+"""处理主机侧请求的工作协程池。"""
+info_funcs["dispatcher"] = dispatcher.stats
+
+
+async def _greet() -> bool:
+    """Negotiate the encoding and the session, returns whether it succeeded."""
+    global conn_codec
     assert conn
-    hello = json.dumps({"opid": str(uuid4()), "opnm": "/greet/hello", "opct": {}})
-    await conn.send(hello)
+    hello = ConnectionMessageDict(
+        opid=str(uuid4()),
+        opnm="/greet/hello",
+        opct={
+            "encodings": supported_encodings(lconfig.guest_connection_encodings),
+            "session": replay.session,
+            "seq": replay.seq
+        }
+    )
+    conn_codec = json_codec
+    await conn.send(json.dumps(hello))
     try:
         async with asyncio.timeout(60):
-            assert await conn.recv() == hello
+            reply: ConnectionMessageDict = json.loads(await conn.recv())
+        assert reply["opid"] == hello["opid"] and reply["opnm"] == hello["opnm"]
+        # hosts echoing the hello without picking an encoding keep using JSON
+        conn_codec = get_codec(reply["opct"].get("encoding"))
+        resumed = reply["opct"].get("session") == replay.session and "ack" in reply["opct"]
+        acked = int(reply["opct"]["ack"]) if resumed else replay.seq
     except asyncio.TimeoutError:
         logger.error("Connection timed out after 1 minute, disconnecting...")
         await conn.close()
-    except AssertionError:
+        return False
+    except (AssertionError, KeyError, TypeError, ValueError):
         logger.error("Unexpected response, disconnecting...")
         await conn.close()
+        return False
+    logger.debug(f"Using {conn_codec.name!r} encoding for the connection")
 
-    with suppress(ConnectionClosed):
-        while conn.open:
-            data: ConnectionMessageDict = json.loads(await conn.recv())
-            logger.trace(f"Received {data!r}")
-            await _conn_queue.put(asyncio.create_task(_loop_process(data)))
+    if resumed:
+        logger.info(
+            f"Resumed session {replay.session}, "
+            f"replaying {len(replay.pending(acked))} reports"
+        )
+    else:
+        # the host doesn't know the session, reports for it are meaningless now
+        if replay.messages:
+            logger.info(f"Host didn't resume session {replay.session}, dropping reports")
+        await dispatcher.stop()
+    replay.ack(acked)
 
-    while not _conn_queue.empty():
-        (await _conn_queue.get()).cancel()
+    sent = acked
+    while pending := replay.pending(sent):
+        for data in pending:
+            await conn.send(conn_codec.dumps(data))
+            sent = data["opsq"]
+    return True
 
-    logger.info(f"Disconnected to management host {lconfig.guest_connection_hosturl}")
+
+async def conn_loop() -> bool:
+    """Serve the host until disconnected, returns whether the greeting succeeded."""
+    global _conn_ready
+    assert conn
+    bye = False
+    greeted = False
+    try:
+        with suppress(ConnectionClosed):
+            if not await _greet():
+                return False
+            greeted = True
+            _conn_ready = True
+            dispatcher.start()
+            while conn.open:
+                data: ConnectionMessageDict = decode_frame(conn_codec, await conn.recv())
+                logger.trace(f"Received {data!r}")
+                if data["opnm"] == "/greet/bye":
+                    bye = True
+                    await conn.send(conn_codec.dumps(data))
+                    await conn.close()
+                elif data["opnm"] == "/greet/ack":
+                    replay.ack(data["opct"].get("seq", 0))
+                elif data["opnm"] == "/cancel":
+                    await send_message(
+                        ConnectionMessageDict(
+                            opid=data["opid"],
+                            opnm="/event/report/cancel",
+                            opct={"cancelled": dispatcher.cancel(data["opct"].get("opid", ""))}
+                        )
+                    )
+                else:
+                    await dispatcher.submit(data, not lconfig.guest_dispatch_reject_when_full)
+    finally:
+        _conn_ready = False
+        subscriptions.cancel_all()
+        profiler.cancel()
+        if bye:
+            # the host ended the session on purpose, nothing to resume
+            await dispatcher.stop()
+            replay.reset()
+
+        logger.info(f"Disconnected to management host {lconfig.guest_connection_hosturl}")
+    return greeted
+
+
+async def _reconnect_loop():
+    global conn
+    url = lconfig.guest_connection_hosturl
+    delays = backoff_delays(lconfig.guest_reconnect_base_delay, lconfig.guest_reconnect_max_delay)
+    while True:
+        try:
+            conn = await connect(url)
+        except InvalidURI:
+            logger.error(f"Invalid management host URL {url!r}, not connecting")
+            return
+        except (OSError, InvalidHandshake, asyncio.TimeoutError):
+            delay = next(delays)
+            logger.warning(
+                f"Failed to connect to host {url!r}, is your host accessible? "
+                f"Retrying in {delay:.1f}s..."
+            )
+            await asyncio.sleep(delay)
+            continue
+
+        logger.info(f"Connected to management host {url!r}")
+        try:
+            greeted = await conn_loop()
+        except Exception as e:
+            # e.g. a malformed frame, which must not end reconnecting for good
+            logger.opt(exception=e).error("Connection to management host failed")
+            greeted = False
+            await conn.close()
+        conn = None
+        if greeted:
+            # only a healthy session resets the backoff, a flapping host keeps it
+            delays = backoff_delays(
+                lconfig.guest_reconnect_base_delay, lconfig.guest_reconnect_max_delay
+            )
+        # even the first retry is jittered, so guests don't reconnect all at once
+        await asyncio.sleep(next(delays))
 
 
 @driver.on_startup
 async def init_connection():
-    global conn, conn_task, _conn_restart_task
+    global conn_task
     if not lconfig.guest_connection_hosturl:
         logger.info("Not connecting to any management host as not configured")
         return
-    if _conn_restart_task:
-        await asyncio.sleep(5)
-    try:
-        conn = await connect(lconfig.guest_connection_hosturl)
-        logger.info(f"Connected to management host {lconfig.guest_connection_hosturl!r}")
-        conn_task = asyncio.create_task(conn_loop())
-    except ConnectionRefusedError:
-        logger.warning(f"Failed to connect to host {lconfig.guest_connection_hosturl!r}, is your host accessible?")
-        _conn_restart_task = asyncio.create_task(init_connection())
+    conn_task = asyncio.create_task(_reconnect_loop())
 
 
 @driver.on_shutdown
 async def stop_connection():
-    if conn:
-        await conn.close()
     if conn_task:
         conn_task.cancel()
-    if _conn_restart_task:
-        _conn_restart_task.cancel()
\ No newline at end of file
+    if conn:
+        await conn.close()
+    subscriptions.cancel_all()
+    await dispatcher.stop()
@@ -0,0 +1,173 @@
+import asyncio
+import time
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Optional, Set
+
+from nonebot import logger
+
+from .typing import ConnectionMessageDict, DispatcherInfoDict
+
+
+class Dispatcher:
+    """Bounded worker pool running received operations.
+
+    Received messages wait in a bounded inbox until one of the workers is free. When
+    the inbox is full, `submit()` either waits (applying backpressure to the
+    connection) or rejects the message as busy.
+
+    Messages carrying a send timestamp (`opts`) or a deadline (`opdl`) expire at the
+    deadline: expired messages are rejected before running, and operations still
+    running at the deadline are cancelled and rejected.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[ConnectionMessageDict], Coroutine[Any, Any, None]],
+        reject: Callable[[ConnectionMessageDict, str], Awaitable[None]],
+        workers: int,
+        inbox: int,
+        expiry: float
+    ) -> None:
+        self._handler = handler
+        self._reject = reject
+        self.nworkers = max(1, workers)
+        self.expiry = expiry
+        self._inbox: "asyncio.Queue[ConnectionMessageDict]" = asyncio.Queue(max(1, inbox))
+        self._workers: List[asyncio.Task] = []
+        self._queued: Set[str] = set()
+        self._dropped: Set[str] = set()
+        self.running: Dict[str, asyncio.Task] = {}
+        self.processed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.expired = 0
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.nworkers)
+        ]
+
+    async def stop(self) -> None:
+        """Stop all workers, cancelling running and queued operations."""
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._workers.clear()
+        while not self._inbox.empty():
+            self._inbox.get_nowait()
+            self._inbox.task_done()
+        self._queued.clear()
+        self._dropped.clear()
+
+    def deadline(self, data: ConnectionMessageDict) -> Optional[float]:
+        """Unix timestamp after which the message is expired, if it has one.
+
+        Raises `ValueError` if `opdl` or `opts` is not a number.
+        """
+        try:
+            if (dl := data.get("opdl")) is not None:
+                return float(dl)
+            if (ts := data.get("opts")) is not None:
+                return float(ts) + self.expiry
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid timestamps in {data!r}") from None
+        return None
+
+    async def submit(self, data: ConnectionMessageDict, wait: bool = True) -> None:
+        """Queue a message, or reject it if it is invalid, expired or the inbox is full."""
+        try:
+            dl = self.deadline(data)
+        except ValueError:
+            self.rejected += 1
+            await self._try_reject(data, "invalid")
+            return
+        if dl is not None and dl <= time.time():
+            self.expired += 1
+            await self._try_reject(data, "expired")
+            return
+        self._queued.add(data["opid"])
+        if wait:
+            await self._inbox.put(data)
+            return
+        try:
+            self._inbox.put_nowait(data)
+        except asyncio.QueueFull:
+            self._queued.discard(data["opid"])
+            self.rejected += 1
+            await self._try_reject(data, "busy")
+
+    def cancel(self, opid: str) -> bool:
+        """Abort a running or queued operation by its `opid`, it will be rejected."""
+        if opid not in self._queued and opid not in self.running:
+            return False
+        self._dropped.add(opid)
+        if task := self.running.get(opid):
+            task.cancel()
+        self.cancelled += 1
+        return True
+
+    async def _try_reject(self, data: ConnectionMessageDict, reason: str) -> None:
+        try:
+            await self._reject(data, reason)
+        except Exception as e:
+            logger.opt(exception=e).debug(f"Failed to reject {data['opid']!r}")
+
+    async def _worker(self) -> None:
+        while True:
+            data = await self._inbox.get()
+            opid = data["opid"]
+            self._queued.discard(opid)
+            if opid in self._dropped:
+                self._dropped.discard(opid)
+                self._inbox.task_done()
+                await self._try_reject(data, "cancelled")
+                continue
+            timeout = None
+            if (dl := self.deadline(data)) is not None:
+                if (timeout := dl - time.time()) <= 0:
+                    # expired while waiting in the inbox, don't even start it
+                    self.expired += 1
+                    self._inbox.task_done()
+                    await self._try_reject(data, "expired")
+                    continue
+            task = asyncio.create_task(self._handler(data))
+            self.running[opid] = task
+            try:
+                # waiting without awaiting the task directly, so cancelling the
+                # task won't stop the worker and stopping the worker is explicit
+                await asyncio.wait((task,), timeout=timeout)
+                if not task.done():
+                    self.expired += 1
+                    self._dropped.discard(opid)
+                    task.cancel()
+                    await asyncio.wait((task,))
+                    await self._try_reject(data, "expired")
+            finally:
+                if not task.done():
+                    task.cancel()
+                self.running.pop(opid, None)
+                self.processed += 1
+                self._inbox.task_done()
+            if not task.cancelled() and (exc := task.exception()):
+                logger.opt(exception=exc).error(f"Failed to process {data['opnm']!r}")
+            elif task.cancelled() and opid in self._dropped:
+                await self._try_reject(data, "cancelled")
+            self._dropped.discard(opid)
+
+    def stats(self) -> DispatcherInfoDict:
+        """Queue depth and worker utilization"""
+        return {
+            "workers": self.nworkers,
+            "busy": len(self.running),
+            "utilization": len(self.running) / self.nworkers,
+            "queued": self._inbox.qsize(),
+            "inbox_size": self._inbox.maxsize,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "expired": self.expired
+        }
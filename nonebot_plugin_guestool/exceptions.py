@@ -19,4 +19,12 @@ class MatcherHackError(MatcherError):
 
 
 class ModelValidateError(GuestoolError):
-    pass
\ No newline at end of file
+    pass
+
+
+class ProfileError(GuestoolError):
+    pass
+
+
+class MemoryTraceError(GuestoolError):
+    pass
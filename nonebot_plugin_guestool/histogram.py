@@ -0,0 +1,74 @@
+from array import array
+
+from .typing import LatencySummaryDict
+
+_SUB_BITS = 3
+_SUB = 1 << _SUB_BITS
+"""Sub-buckets per power of 2, bounding the relative error to 1/8."""
+_LINEAR = _SUB * 2
+_OCTAVES = 40
+_NBUCKETS = _LINEAR + _SUB * _OCTAVES
+"""Covers values up to about 2^44ns (~4.9h), larger values go to the last bucket."""
+
+
+def _index(value: int) -> int:
+    if value < _LINEAR:
+        return max(0, value)
+    shift = value.bit_length() - _SUB_BITS - 1
+    idx = _LINEAR + (shift - 1) * _SUB + (value >> shift) - _SUB
+    return min(idx, _NBUCKETS - 1)
+
+
+def _lower_bound(idx: int) -> int:
+    if idx < _LINEAR:
+        return idx
+    shift, sub = divmod(idx - _LINEAR, _SUB)
+    return (sub + _SUB) << (shift + 1)
+
+
+class LatencyHistogram:
+    """Log-bucketed (HDR-style) latency histogram in nanoseconds.
+
+    Memory is constant whatever the number of records, and percentiles are
+    accurate to one bucket, i.e. about 12.5%.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts = array("Q", bytes(8 * _NBUCKETS))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int) -> None:
+        self.counts[_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> int:
+        """Approximate value at percentile `q` (0-100), in nanoseconds."""
+        if not self.count:
+            return 0
+        rank = max(1, round(self.count * q / 100))
+        seen = 0
+        for idx, cnt in enumerate(self.counts):
+            seen += cnt
+            if seen >= rank:
+                # the middle of the bucket, but never above the real max
+                lo, hi = _lower_bound(idx), _lower_bound(idx + 1)
+                return min((lo + hi) // 2, self.max)
+        return self.max
+
+    def summary(self) -> LatencySummaryDict:
+        """Count and p50/p90/p99/max/mean in milliseconds"""
+        return {
+            "count": self.count,
+            "p50": self.percentile(50) / 1e6,
+            "p90": self.percentile(90) / 1e6,
+            "p99": self.percentile(99) / 1e6,
+            "max": self.max / 1e6,
+            "mean": self.total / self.count / 1e6 if self.count else 0.
+        }
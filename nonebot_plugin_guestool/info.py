@@ -1,11 +1,12 @@
 import asyncio
+from contextlib import suppress
 import os
 from pathlib import Path
 import platform
 import shlex
 import sys
 import time
-from typing import TYPE_CHECKING, List, Optional, Union
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Union
 
 import psutil
 
@@ -13,13 +14,17 @@ from .typing import (
     CPUInfoDict,
     DiskIODict,
     MemoryInfoDict,
+    MetricsSampleDict,
     NetworkIODict,
     PartitionInfoDict,
     PlatformInfoDict,
     ProcessInfoDict,
+    ProcessSortKey,
     PythonVersionDict,
     TimeInfoDict
 )
+from .probe import ProbeCache, lconfig, run_blocking
+from .sampler import cpu_percent_between, diff_disk_io, diff_network_io, sampler
 
 if TYPE_CHECKING:
     import psutil._common
@@ -42,17 +47,23 @@ def info_python_version() -> PythonVersionDict:
     }
 
 
-async def info_cpu(smptime: float = .1) -> CPUInfoDict:
+async def info_cpu(smptime: Optional[float] = None) -> CPUInfoDict:
     """CPU usage info
     
     Args:
-    - smptime: sample time for `psutil.cpu_percent()`, values <= 0 will use the last\
-      sampling time.
+    - smptime: sample time for CPU usage, values <= 0 will use the time since the last\
+      `psutil.cpu_percent()` call. `None` reads the background sampler if it is\
+      running, otherwise samples for 0.1s.
     """
-    if smptime > 0:
-        psutil.cpu_percent()
-    await asyncio.sleep(max(0, smptime))
-    cpu_percent = psutil.cpu_percent()
+    if smptime is None and sampler.ready:
+        cpu_percent = sampler.latest_cpu_percent()
+    elif smptime is not None and smptime <= 0:
+        cpu_percent = psutil.cpu_percent()
+    else:
+        # own snapshots, so other calls during the window cannot shorten it
+        ref = psutil.cpu_times()
+        await asyncio.sleep(.1 if smptime is None else smptime)
+        cpu_percent = cpu_percent_between(ref, psutil.cpu_times())
 
     cpu_count = psutil.cpu_count(logical=False)
     cpu_count_logical = psutil.cpu_count()
@@ -98,19 +109,23 @@ def info_memory() -> MemoryInfoDict:
     }
 
 
-def _info_partition(part: "psutil._common.sdiskpart") -> PartitionInfoDict:
+_disk_usage = ProbeCache(psutil.disk_usage)
+
+
+async def _info_partition(
+    part: "psutil._common.sdiskpart", timeout: float
+) -> PartitionInfoDict:
     mnt = part.mountpoint
     fs = part.fstype
     dev = part.device
-    try:
-        usage = psutil.disk_usage(mnt)
-    except Exception as e:
+    usage, error = await _disk_usage.get(mnt, timeout)
+    if usage is None:
         return {
             "device": dev,
             "mountpoint": mnt,
             "filesystem": fs,
             "usage": None,
-            "error": str(e)
+            "error": error or "unknown error"
         }
     return {
         "device": dev,
@@ -122,72 +137,181 @@ def _info_partition(part: "psutil._common.sdiskpart") -> PartitionInfoDict:
             "used": usage.used,
             "percent": usage.percent
         },
-        "error": None
+        "error": error
     }
 
 
-def info_all_partition(physical_only: bool = True) -> List[PartitionInfoDict]:
-    return [_info_partition(x) for x in psutil.disk_partitions(not physical_only)]
+async def info_all_partition(
+    physical_only: bool = True, timeout: Optional[float] = None
+) -> List[PartitionInfoDict]:
+    """Partitions and their usage
 
+    Usage of every mountpoint is probed in a thread with its own timeout. A probe\
+    which timed out reports the last known usage (or none) with a `timeout` error,\
+    and the mountpoint is not probed again until the hanging probe finishes.
 
-def _info_disk_io(
-    device: str, ref: "psutil._common.sdiskio", cur: "psutil._common.sdiskio"
-) -> DiskIODict:
-    return {
-        "device": device,
-        "read_bytes": cur.read_bytes - ref.read_bytes,
-        "write_bytes": cur.write_bytes - ref.write_bytes
-    }
+    Args:
+    - physical_only: whether to report physical devices only.
+    - timeout: timeout for probing every mountpoint, `None` uses the configured one.
+    """
+    timeout = lconfig.guest_probe_timeout if timeout is None else timeout
+    parts = await run_blocking(psutil.disk_partitions, not physical_only)
+    return list(await asyncio.gather(*(_info_partition(x, timeout) for x in parts)))
+
+
+async def info_all_disk_io(smptime: Optional[float] = None) -> List[DiskIODict]:
+    """Disk IO in a sampling window
 
+    Args:
+    - smptime: sample time for disk IO counters. `None` reads the latest window of\
+      the background sampler if it is running, otherwise samples for 1s.
+    """
+    if smptime is None and sampler.ready:
+        return sampler.latest_disk_io()
 
-async def info_all_disk_io(smptime: float = 1.) -> List[DiskIODict]:
     ref = psutil.disk_io_counters(True)
-    await asyncio.sleep(smptime)
+    await asyncio.sleep(1. if smptime is None else smptime)
     cur = psutil.disk_io_counters(True)
 
-    return [_info_disk_io(dev, ref[dev], cur[dev]) for dev in ref if dev in cur]
+    return diff_disk_io(ref, cur)
 
 
-def _info_network_io(
-    device: str, ref: "psutil._common.snetio", cur: "psutil._common.snetio"
-) -> NetworkIODict:
-    return {
-        "device": device,
-        "sent_bytes": cur.bytes_sent - ref.bytes_sent,
-        "recv_bytes": cur.bytes_recv - ref.bytes_recv
-    }
+async def info_all_network_io(smptime: Optional[float] = None) -> List[NetworkIODict]:
+    """Network IO in a sampling window
 
+    Args:
+    - smptime: sample time for network IO counters. `None` reads the latest window\
+      of the background sampler if it is running, otherwise samples for 1s.
+    """
+    if smptime is None and sampler.ready:
+        return sampler.latest_network_io()
 
-async def info_all_network_io(smptime: float = 1.) -> List[NetworkIODict]:
     ref = psutil.net_io_counters(True)
-    await asyncio.sleep(smptime)
+    await asyncio.sleep(1. if smptime is None else smptime)
     cur = psutil.net_io_counters(True)
 
-    return [_info_network_io(dev, ref[dev], cur[dev]) for dev in ref if dev in cur]
+    return diff_network_io(ref, cur)
 
 
-async def _info_process(proc: psutil.Process, smptime: float = .1) -> ProcessInfoDict:
-    proc.cpu_percent()
-    await asyncio.sleep(smptime)
+def info_metrics_history(window: int = 1) -> List[MetricsSampleDict]:
+    """Recent windows recorded by the background sampler, oldest first
+
+    Args:
+    - window: maximum number of windows to return.
+    """
+    return sampler.recent(window)
+
+
+_PROCESS_BATCH = 64
+"""Number of processes read in one blocking probe."""
+
+_process_sort_keys = {
+    "cpu": lambda x: x["cpu_stdperc"],
+    "mem": lambda x: x["mem"],
+    "age": lambda x: x["age"],
+}
+
+
+def _iter_pids(pids: List[int]) -> Iterator[psutil.Process]:
+    for pid in pids:
+        with suppress(psutil.Error):
+            yield psutil.Process(pid)
+
+
+def _iter_processes(
+    name: Optional[str] = None, pids: Optional[List[int]] = None
+) -> Iterator[psutil.Process]:
+    if pids is not None:
+        procs: Iterable[psutil.Process] = _iter_pids(pids)
+    else:
+        procs = psutil.process_iter()
+    if not name:
+        yield from procs
+        return
+    name = name.lower()
+    for proc in procs:
+        with suppress(psutil.Error):
+            if name in proc.name().lower():
+                yield proc
+
+
+def _info_process(proc: psutil.Process, now: float, ncpu: int) -> ProcessInfoDict:
     with proc.oneshot():
         name = proc.name()
-        age = time.time() - proc.create_time()
+        age = now - proc.create_time()
         cpu = proc.cpu_percent()
         pid = proc.pid
         mem: int = proc.memory_info().rss
-    normalized = cpu / psutil.cpu_count()
     return {
         "pid": pid,
         "name": name,
         "age": age,
         "cpu_stdperc": cpu,
-        "cpu_normalized": normalized,
+        "cpu_normalized": cpu / ncpu,
         "mem": mem
     }
 
 
-async def info_processes(smptime: float = .1) -> List[ProcessInfoDict]:
-    return [await _info_process(p, smptime) for p in psutil.process_iter()]
+def _prime_processes(
+    name: Optional[str] = None, pids: Optional[List[int]] = None
+) -> List[psutil.Process]:
+    procs: List[psutil.Process] = []
+    for proc in _iter_processes(name, pids):
+        with suppress(psutil.Error):
+            proc.cpu_percent()
+            procs.append(proc)
+    return procs
+
+
+def _read_processes(
+    procs: List[psutil.Process], now: float, ncpu: int
+) -> List[ProcessInfoDict]:
+    res: List[ProcessInfoDict] = []
+    for proc in procs:
+        with suppress(psutil.Error):
+            res.append(_info_process(proc, now, ncpu))
+    return res
+
+
+async def info_processes(
+    smptime: float = .1,
+    name: Optional[str] = None,
+    pids: Optional[List[int]] = None,
+    sort: Optional[ProcessSortKey] = None,
+    limit: int = 0
+) -> List[ProcessInfoDict]:
+    """Processes info
+
+    All processes are primed for `cpu_percent()` together and share one sampling\
+    window, so the request takes about `smptime` regardless of the process count.\
+    Processes are iterated and read in probe threads, in batches.
+
+    Args:
+    - smptime: sample time for `psutil.Process.cpu_percent()`.
+    - name: only report processes whose name contains this (case-insensitive).
+    - pids: only report processes with these PIDs.
+    - sort: sort descending by `cpu`, `mem` or `age` before applying `limit`.
+    - limit: report at most this many processes, values <= 0 mean no limit.
+    """
+    if sort and sort not in _process_sort_keys:
+        raise ValueError(f"unknown sort key {sort!r}, expected one of {list(_process_sort_keys)}")
+    procs = await run_blocking(_prime_processes, name, pids)
+
+    await asyncio.sleep(smptime)
+
+    now = time.time()
+    ncpu = psutil.cpu_count() or 1
+    res: List[ProcessInfoDict] = []
+    for i in range(0, len(procs), _PROCESS_BATCH):
+        res.extend(
+            await run_blocking(_read_processes, procs[i:i + _PROCESS_BATCH], now, ncpu)
+        )
+
+    if sort:
+        res.sort(key=_process_sort_keys[sort], reverse=True)
+    if limit > 0:
+        del res[limit:]
+    return res
 
 
 def _linux_name_envlike_parse(
@@ -268,7 +392,11 @@ def _linux_name_lsbrelease() -> Optional[str]:
 #     )
 
 
-def info_system_platform() -> PlatformInfoDict:
+async def info_system_platform() -> PlatformInfoDict:
+    return await run_blocking(_system_platform)
+
+
+def _system_platform() -> PlatformInfoDict:
     system, _, release, version, machine, _ = platform.uname()
     system, release, version = platform.system_alias(system, release, version)
 
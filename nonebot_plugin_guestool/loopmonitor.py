@@ -0,0 +1,165 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import suppress
+from types import FrameType
+from typing import Deque, Dict, List, Optional
+
+from nonebot import get_driver, logger
+
+from .config import Config
+from .histogram import LatencyHistogram
+from .typing import EventLoopInfoDict, SlowCallbackDict
+
+driver = get_driver()
+
+lconfig = Config(**driver.config.dict())
+"""本插件配置信息。"""
+
+_STACK_DEPTH = 8
+
+
+def _describe_stack(frame: Optional[FrameType]) -> List[str]:
+    stack: List[str] = []
+    while frame is not None and len(stack) < _STACK_DEPTH:
+        code = frame.f_code
+        stack.append(f"{code.co_filename}:{frame.f_lineno} in {code.co_name}")
+        frame = frame.f_back
+    return stack
+
+
+class LoopMonitor:
+    """Event loop lag and the code stalling the loop.
+
+    A heartbeat task sleeps for `interval` again and again, and records how late it
+    wakes up as the loop lag. A watchdog thread checks whether the heartbeat is
+    late by more than `threshold`: if so, the loop is stuck in some callback, and
+    the watchdog captures what the loop thread is running at that moment.
+
+    Stalls longer than `threshold + interval` are always caught.
+    """
+
+    def __init__(self, interval: float, threshold: float, recent: int = 20) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = LatencyHistogram()
+        self.slow = 0
+        self.slow_by_source: Dict[str, int] = {}
+        self.recent: Deque[SlowCallbackDict] = deque(maxlen=recent)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread = 0
+        self._due = 0.
+        self._seq = 0
+        self._captured: Optional[SlowCallbackDict] = None
+        self._captured_seq = -1
+
+    def start(self) -> None:
+        if self._task:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._due = time.perf_counter() + self.interval
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(
+            target=self._watchdog, name="guestool-loop-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._due = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0., time.perf_counter() - self._due)
+            self.lag.record(int(lag * 1e9))
+            if lag > self.threshold:
+                self.slow += 1
+                if self._captured is not None and self._captured_seq == self._seq:
+                    record = self._captured
+                else:
+                    record = {
+                        "timestamp": time.time(), "duration": 0., "source": None,
+                        "task": None, "coroutine": None, "stack": []
+                    }
+                record["duration"] = lag
+                source = record["source"] or "<unknown>"
+                self.slow_by_source[source] = self.slow_by_source.get(source, 0) + 1
+                self.recent.append(record)
+                if lag > 1:
+                    logger.warning(f"Event loop was blocked for {lag:.2f}s by {source}")
+            self._captured = None
+            self._seq += 1
+
+    def _watchdog(self) -> None:
+        while not self._stop.wait(self.threshold / 2):
+            if time.perf_counter() - self._due <= self.threshold:
+                continue
+            if self._captured_seq == self._seq:
+                continue
+            self._captured_seq = self._seq
+            self._captured = self._capture()
+
+    def _capture(self) -> SlowCallbackDict:
+        frame = sys._current_frames().get(self._loop_thread)
+        source = None
+        if frame is not None:
+            # the innermost Python code, whatever it is blocked in
+            module = frame.f_globals.get("__name__", "?")
+            source = f"{module}:{frame.f_code.co_name}"
+        task = coro = None
+        # read from another thread without locking, only for reporting
+        with suppress(Exception):
+            if current := asyncio.tasks._current_tasks.get(self._loop):  # type: ignore[attr-defined]
+                task = current.get_name()
+                coro = getattr(current.get_coro(), "__qualname__", None)
+        return {
+            "timestamp": time.time(),
+            "duration": 0.,
+            "source": source,
+            "task": task,
+            "coroutine": coro,
+            "stack": _describe_stack(frame)
+        }
+
+    def stats(self) -> EventLoopInfoDict:
+        """Loop lag percentiles, slow callbacks and live tasks"""
+        return {
+            "enabled": self._task is not None,
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "lag": self.lag.summary(),
+            "slow_callbacks": self.slow,
+            "slow_by_source": dict(self.slow_by_source),
+            "recent_slow": list(self.recent),
+            "tasks": len(asyncio.all_tasks())
+        }
+
+
+loop_monitor = LoopMonitor(lconfig.guest_loop_monitor_interval, lconfig.guest_loop_slow_threshold)
+
+
+@driver.on_startup
+async def start_loop_monitor() -> None:
+    if lconfig.guest_loop_monitor_interval > 0:
+        loop_monitor.start()
+
+
+@driver.on_shutdown
+async def stop_loop_monitor() -> None:
+    await loop_monitor.stop()
@@ -0,0 +1,197 @@
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Dict, List, Literal, Optional, Tuple
+
+from nonebot import get_driver, logger
+
+from .attribution import PluginResolver
+from .config import Config
+from .exceptions import MemoryTraceError
+from .probe import run_blocking
+from .typing import MemoryDiffDict, MemorySnapshotDict, MemoryStatDict, MemoryTraceInfoDict
+
+driver = get_driver()
+
+lconfig = Config(**driver.config.dict())
+"""本插件配置信息。"""
+
+MemoryGroupBy = Literal["filename", "lineno", "plugin"]
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _group(
+    stats: List[Tuple[str, Optional[int], int, int, int, int]],
+    group_by: MemoryGroupBy,
+    top: int
+) -> List[MemoryStatDict]:
+    """Attribute `(file, line, size, count, size_diff, count_diff)` and group by plugin."""
+    resolve = PluginResolver()
+    result: List[MemoryStatDict] = []
+    if group_by == "plugin":
+        plugins: Dict[Optional[str], MemoryStatDict] = {}
+        for file, _, size, count, size_diff, count_diff in stats:
+            plugin = resolve(file)
+            if (item := plugins.get(plugin)) is None:
+                item = plugins[plugin] = {
+                    "file": None, "line": None, "plugin": plugin, "module": None,
+                    "size": 0, "count": 0, "size_diff": 0, "count_diff": 0
+                }
+            item["size"] += size
+            item["count"] += count
+            item["size_diff"] += size_diff
+            item["count_diff"] += count_diff
+        result = sorted(plugins.values(), key=lambda x: x["size"], reverse=True)
+    else:
+        result = [
+            {
+                "file": file, "line": line, "plugin": resolve(file), "module": resolve.module(file),
+                "size": size, "count": count, "size_diff": size_diff, "count_diff": count_diff
+            }
+            for file, line, size, count, size_diff, count_diff in stats
+        ]
+    return result[:top] if top > 0 else result
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(_FILTERS)
+
+
+def _statistics(
+    snapshot: tracemalloc.Snapshot, group_by: MemoryGroupBy
+) -> List[Tuple[str, Optional[int], int, int, int, int]]:
+    key = "lineno" if group_by == "lineno" else "filename"
+    return [
+        (
+            st.traceback[0].filename, st.traceback[0].lineno if key == "lineno" else None,
+            st.size, st.count, 0, 0
+        )
+        for st in snapshot.statistics(key)
+    ]
+
+
+def _compare(
+    new: tracemalloc.Snapshot, old: tracemalloc.Snapshot, group_by: MemoryGroupBy
+) -> List[Tuple[str, Optional[int], int, int, int, int]]:
+    key = "lineno" if group_by == "lineno" else "filename"
+    return [
+        (
+            st.traceback[0].filename, st.traceback[0].lineno if key == "lineno" else None,
+            st.size, st.count, st.size_diff, st.count_diff
+        )
+        for st in new.compare_to(old, key)
+    ]
+
+
+class MemoryTracer:
+    """tracemalloc snapshots taken on demand, and the growth between them.
+
+    Tracing is off until started, as it slows down every allocation and takes
+    memory for every traced block, growing with the number of frames kept.
+    """
+
+    def __init__(self, max_frames: int, max_snapshots: int) -> None:
+        self.max_frames = max(1, max_frames)
+        self.max_snapshots = max(1, max_snapshots)
+        self.started_here = False
+        self.snapshots: "OrderedDict[int, Tuple[float, tracemalloc.Snapshot]]" = OrderedDict()
+        self._next_id = 1
+
+    def info(self) -> MemoryTraceInfoDict:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced": current,
+            "peak": peak,
+            "overhead": tracemalloc.get_tracemalloc_memory(),
+            "snapshots": list(self.snapshots)
+        }
+
+    def start(self, frames: int = 1) -> MemoryTraceInfoDict:
+        if tracemalloc.is_tracing():
+            raise MemoryTraceError("Memory tracing is already started")
+        tracemalloc.start(min(max(1, frames), self.max_frames))
+        self.started_here = True
+        logger.info(f"Started tracing memory with {tracemalloc.get_traceback_limit()} frames")
+        return self.info()
+
+    def stop(self) -> MemoryTraceInfoDict:
+        """Stop tracing (if started here) and drop all snapshots."""
+        if self.started_here:
+            tracemalloc.stop()
+            self.started_here = False
+            logger.info("Stopped tracing memory")
+        self.snapshots.clear()
+        return self.info()
+
+    async def _take(self) -> Tuple[int, float, tracemalloc.Snapshot]:
+        if not tracemalloc.is_tracing():
+            raise MemoryTraceError("Memory tracing is not started")
+        id, self._next_id = self._next_id, self._next_id + 1
+        now = time.time()
+        # a snapshot of a large process takes a while, not blocking the event loop
+        snapshot = await run_blocking(_take_snapshot)
+        self.snapshots[id] = (now, snapshot)
+        while len(self.snapshots) > self.max_snapshots:
+            self.snapshots.popitem(last=False)
+        return id, now, snapshot
+
+    async def snapshot(self, top: int = 20, group_by: MemoryGroupBy = "filename") -> MemorySnapshotDict:
+        """Take a snapshot and report its top allocation sites."""
+        id, ts, snapshot = await self._take()
+        stats = await run_blocking(_statistics, snapshot, group_by)
+        return {
+            "id": id,
+            "timestamp": ts,
+            "total": sum(x[2] for x in stats),
+            "top": _group(stats, group_by, top)
+        }
+
+    def _get(self, id: int) -> Tuple[float, tracemalloc.Snapshot]:
+        if (found := self.snapshots.get(id)) is None:
+            raise MemoryTraceError(f"Unknown memory snapshot {id} (kept: {list(self.snapshots)})")
+        return found
+
+    async def diff(
+        self,
+        since: Optional[int] = None,
+        to: Optional[int] = None,
+        top: int = 20,
+        group_by: MemoryGroupBy = "filename"
+    ) -> MemoryDiffDict:
+        """Growth from snapshot `since` (the oldest kept one by default) to `to`
+        (a new snapshot by default), largest growth first."""
+        if since is None:
+            if not self.snapshots:
+                raise MemoryTraceError("No memory snapshot to compare with")
+            since = next(iter(self.snapshots))
+        old_ts, old = self._get(since)
+        if to is None:
+            to, new_ts, new = await self._take()
+        else:
+            new_ts, new = self._get(to)
+        stats = await run_blocking(_compare, new, old, group_by)
+        items = _group(stats, group_by, 0)
+        items.sort(key=lambda x: abs(x["size_diff"]), reverse=True)
+        return {
+            "since": since,
+            "to": to,
+            "elapsed": new_ts - old_ts,
+            "total_diff": sum(x[4] for x in stats),
+            "top": items[:top] if top > 0 else items
+        }
+
+
+memory_tracer = MemoryTracer(lconfig.guest_memory_max_frames, lconfig.guest_memory_max_snapshots)
+
+
+@driver.on_shutdown
+async def stop_memory_tracer() -> None:
+    memory_tracer.stop()
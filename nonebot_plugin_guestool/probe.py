@@ -0,0 +1,81 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Generic, Optional, Set, Tuple, TypeVar
+
+from nonebot import get_driver
+
+from .config import Config
+
+T = TypeVar("T")
+
+driver = get_driver()
+
+lconfig = Config(**driver.config.dict())
+"""本插件配置信息。"""
+
+probe_executor = ThreadPoolExecutor(
+    max(1, lconfig.guest_probe_workers), thread_name_prefix="guestool-probe"
+)
+"""Dedicated threads for blocking psutil probes and file reads."""
+
+cache_executor = ThreadPoolExecutor(
+    max(1, lconfig.guest_probe_workers), thread_name_prefix="guestool-probe-cache"
+)
+"""Threads for `ProbeCache` probes, apart from `probe_executor` as they may hang."""
+
+
+def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> "asyncio.Future[T]":
+    """Run a blocking probe on the probe threads without blocking the event loop."""
+    return asyncio.get_running_loop().run_in_executor(
+        probe_executor, partial(func, *args, **kwargs)
+    )
+
+
+class ProbeCache(Generic[T]):
+    """Per-key blocking probes with timeouts and last-known-good results.
+
+    A probe which times out keeps running in its thread. Until it finishes, requests
+    for the same key return the last known good result immediately instead of
+    waiting (or starting another probe which would hang as well). Probes run on
+    `cache_executor`, so hanging ones never hold up `run_blocking`; once as many
+    probes hang as there are threads, no new probe is started, as it would only
+    wait in the queue.
+    """
+
+    def __init__(self, func: Callable[[str], T]) -> None:
+        self._func = func
+        self._max_stalled = max(1, lconfig.guest_probe_workers)
+        self._pending: Dict[str, "asyncio.Future[T]"] = {}
+        self._stalled: Set[str] = set()
+        self.last_good: Dict[str, T] = {}
+
+    def _done(self, key: str, fut: "asyncio.Future[T]") -> None:
+        self._pending.pop(key, None)
+        self._stalled.discard(key)
+        if not fut.cancelled() and fut.exception() is None:
+            self.last_good[key] = fut.result()
+
+    async def get(self, key: str, timeout: float) -> Tuple[Optional[T], Optional[str]]:
+        """Probe `key`, returns the result (or the last good one) and an error."""
+        if key in self._stalled:
+            return self.last_good.get(key), "timeout"
+        if (fut := self._pending.get(key)) is None:
+            if len(self._stalled) >= self._max_stalled:
+                return self.last_good.get(key), "too many hanging probes"
+            fut = asyncio.get_running_loop().run_in_executor(cache_executor, self._func, key)
+            fut.add_done_callback(lambda f: self._done(key, f))
+            self._pending[key] = fut
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), timeout), None
+        except asyncio.TimeoutError:
+            self._stalled.add(key)
+            return self.last_good.get(key), "timeout"
+        except Exception as e:
+            return None, str(e)
+
+
+@driver.on_shutdown
+async def stop_probes() -> None:
+    probe_executor.shutdown(wait=False, cancel_futures=True)
+    cache_executor.shutdown(wait=False, cancel_futures=True)
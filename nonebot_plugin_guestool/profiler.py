@@ -0,0 +1,212 @@
+import asyncio
+import base64
+import cProfile
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import suppress
+from typing import Dict, List, Literal, Optional, Tuple
+
+from nonebot import get_driver, logger
+
+from .attribution import PluginResolver
+from .config import Config
+from .exceptions import ProfileError
+from .typing import (
+    ProfileFunctionDict,
+    ProfileRawChunkDict,
+    ProfileReportDict,
+    ProfileStartDict,
+)
+
+driver = get_driver()
+
+lconfig = Config(**driver.config.dict())
+"""本插件配置信息。"""
+
+ProfileMode = Literal["cprofile", "sample"]
+_FuncKey = Tuple[str, int, str]
+"""(filename, first line number, function name), the same as `pstats` uses"""
+
+
+class StackSampler:
+    """Low-overhead profiler sampling the stack of one thread from another thread.
+
+    The function on top of the stack gets a self sample, every function on the stack
+    (counted once even if recursive) gets a total sample.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.self_samples: "Counter[_FuncKey]" = Counter()
+        self.total_samples: "Counter[_FuncKey]" = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="guestool-stack-sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            code = frame.f_code
+            self.self_samples[(code.co_filename, code.co_firstlineno, code.co_name)] += 1
+            seen = set()
+            while frame is not None:
+                code = frame.f_code
+                seen.add((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            self.total_samples.update(seen)
+
+
+class ProfileSession:
+    def __init__(self, mode: ProfileMode, duration: float, interval: float) -> None:
+        self.mode = mode
+        self.duration = duration
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.elapsed = 0.
+        self.profile: Optional[cProfile.Profile] = None
+        self.sampler: Optional[StackSampler] = None
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def start(self) -> None:
+        if self.mode == "cprofile":
+            self.profile = cProfile.Profile()
+            try:
+                # profiles the thread running the event loop only
+                self.profile.enable()
+            except ValueError as e:
+                raise ProfileError(f"Cannot start cProfile: {e}") from e
+        else:
+            self.sampler = StackSampler(threading.get_ident(), self.interval)
+            self.sampler.start()
+
+    def stop(self) -> None:
+        if self.profile:
+            self.profile.disable()
+            self.profile.create_stats()
+        if self.sampler:
+            self.sampler.stop()
+        self.elapsed = time.perf_counter() - self.started
+
+
+class Profiler:
+    """On-demand CPU profiling, one session at a time.
+
+    A session stops by itself after its duration. The report of the last session
+    is kept until the next session starts, along with its raw `pstats` data (for
+    cProfile sessions) which can be fetched in chunks.
+    """
+
+    def __init__(self, max_duration: float) -> None:
+        self.max_duration = max_duration
+        self.session: Optional[ProfileSession] = None
+        self.last: Optional[ProfileSession] = None
+        self.raw = b""
+
+    def start(
+        self, mode: ProfileMode = "cprofile", duration: float = 10., interval: float = .005
+    ) -> ProfileStartDict:
+        if self.session is not None:
+            raise ProfileError("A profile session is already running")
+        if mode not in ("cprofile", "sample"):
+            raise ProfileError(f"Unknown profile mode {mode!r}")
+        duration = min(max(0., duration), self.max_duration)
+        session = ProfileSession(mode, duration, max(.001, interval))
+        session.start()
+        session.timer = asyncio.get_running_loop().call_later(duration, self._stop)
+        self.session = session
+        self.last, self.raw = None, b""
+        logger.info(f"Started {mode} profile session for {duration}s")
+        return {"mode": mode, "duration": duration, "interval": session.interval}
+
+    def _stop(self) -> None:
+        if (session := self.session) is None:
+            return
+        self.session = None
+        if session.timer:
+            session.timer.cancel()
+        session.stop()
+        if session.profile:
+            self.raw = marshal.dumps(session.profile.stats)  # type: ignore[attr-defined]
+        self.last = session
+        logger.info(f"Stopped {session.mode} profile session after {session.elapsed:.1f}s")
+
+    def stop(self, top: int = 30, sort: Literal["self", "total"] = "self") -> ProfileReportDict:
+        """Stop the running session, and report it (or the last one if stopped)."""
+        self._stop()
+        if (session := self.last) is None:
+            raise ProfileError("No profile session to report")
+        resolve = PluginResolver()
+        functions: List[ProfileFunctionDict] = []
+        if session.profile:
+            stats: Dict[_FuncKey, tuple] = session.profile.stats  # type: ignore[attr-defined]
+            for (file, line, name), (_, ncalls, tottime, cumtime, _) in stats.items():
+                functions.append({
+                    "function": name, "file": file, "line": line, "plugin": resolve(file),
+                    "calls": ncalls, "self": tottime, "total": cumtime
+                })
+        elif session.sampler:
+            sampler = session.sampler
+            for key, total in sampler.total_samples.items():
+                file, line, name = key
+                functions.append({
+                    "function": name, "file": file, "line": line, "plugin": resolve(file),
+                    "calls": None,
+                    "self": sampler.self_samples.get(key, 0) * sampler.interval,
+                    "total": total * sampler.interval
+                })
+        functions.sort(key=lambda x: x[sort], reverse=True)
+        plugins: Dict[str, float] = {}
+        for func in functions:
+            # self time adds up without counting nested calls twice
+            if func["plugin"] is not None:
+                plugins[func["plugin"]] = plugins.get(func["plugin"], 0.) + func["self"]
+        return {
+            "mode": session.mode,
+            "elapsed": session.elapsed,
+            "samples": session.sampler.samples if session.sampler else None,
+            "functions": functions[:top] if top > 0 else functions,
+            "plugins": plugins,
+            "raw_size": len(self.raw)
+        }
+
+    def read_raw(self, offset: int = 0, size: int = 256 * 1024) -> ProfileRawChunkDict:
+        """A chunk of the marshalled `pstats` data of the last cProfile session."""
+        if not self.raw:
+            raise ProfileError("No raw profile data, only stopped cProfile sessions have it")
+        offset = max(0, offset)
+        chunk = self.raw[offset:offset + max(1, size)]
+        return {
+            "offset": offset,
+            "total": len(self.raw),
+            "data": base64.b64encode(chunk).decode(),
+            "eof": offset + len(chunk) >= len(self.raw)
+        }
+
+    def cancel(self) -> None:
+        """Stop the running session, if any, keeping its report."""
+        with suppress(Exception):
+            self._stop()
+
+
+profiler = Profiler(lconfig.guest_profile_max_duration)
+
+
+@driver.on_shutdown
+async def stop_profiler() -> None:
+    profiler.cancel()
@@ -1,9 +1,14 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Union
 
+from ..typing import ApiCallDetailDict, CounterDeltaDict, MatcherLatencyDict, RoutingInfoDict
 from . import runtime
-from .matcher import extract_matcher_info_by_id, matcher_ids
+from .latency import latency_of
+from .matcher import dump_matchers as dump_matchers
+from .matcher import matcher_ids, serialize_matcher, sync_matcher_ids
 from .matcher import hack_matcher_by_id as hack_matcher_by_id
+from .matcher import hack_matchers_by_id as hack_matchers_by_id
 from .matcher import remove_matcher_by_id as remove_matcher_by_id
+from .routing import routing_index
 
 
 def info_bots() -> List[str]:
@@ -15,17 +20,44 @@ def info_bots_connect_time() -> Dict[str, float]:
     return runtime.bot_connect_time
 
 
-def info_recv_events() -> Dict[str, Dict[str, int]]:
-    return runtime.recv_num
+def info_recv_events(
+    since: Optional[int] = None
+) -> Union[Dict[str, Dict[str, int]], CounterDeltaDict]:
+    if since is None:
+        return runtime.recv_num
+    return runtime.counter_delta(runtime.recv_num, runtime.recv_version, since)
 
 
-def info_apicall() -> Dict[str, Dict[str, int]]:
-    return runtime.apicall_num
+def info_apicall(
+    since: Optional[int] = None,
+    detail: bool = False
+) -> Union[Dict[str, Dict[str, int]], CounterDeltaDict, ApiCallDetailDict]:
+    calls: Union[Dict[str, Dict[str, int]], CounterDeltaDict]
+    if since is None:
+        calls = runtime.apicall_num
+    else:
+        calls = runtime.counter_delta(runtime.apicall_num, runtime.apicall_version, since)
+    if detail:
+        return runtime.apicall_detail(calls)
+    return calls
+
+
+def info_matcher_latency(ids: Optional[List[str]] = None) -> Dict[str, MatcherLatencyDict]:
+    result: Dict[str, MatcherLatencyDict] = {}
+    for id in (ids if ids is not None else list(matcher_ids.keys())):
+        if (ma := matcher_ids.get(id)) and (lat := latency_of(ma)):
+            result[id] = lat
+    return result
+
+
+def info_routing() -> RoutingInfoDict:
+    return routing_index.stats()
 
 
 def list_all_matchers() -> List[str]:
+    sync_matcher_ids()
     return list(matcher_ids.keys())
 
 
 def get_matcher_data(id: str):
-    return extract_matcher_info_by_id(id).dict()
\ No newline at end of file
+    return serialize_matcher(matcher_ids[id])
\ No newline at end of file
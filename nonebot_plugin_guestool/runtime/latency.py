@@ -0,0 +1,59 @@
+import time
+from typing import Any, Optional, Type
+from weakref import WeakKeyDictionary
+
+import nonebot.message
+from nonebot import get_driver, logger
+from nonebot.internal.matcher import Matcher
+
+from ..histogram import LatencyHistogram
+from ..typing import MatcherLatencyDict
+
+driver = get_driver()
+
+matcher_latency: "WeakKeyDictionary[Type[Matcher], LatencyHistogram]" = WeakKeyDictionary()
+"""Handler latency of every matcher which has run, dropped with the matcher."""
+matcher_errors: "WeakKeyDictionary[Type[Matcher], int]" = WeakKeyDictionary()
+
+_START_ATTR = "_guestool_run_start"
+
+_orig_apply_run_preprocessors = nonebot.message._apply_run_preprocessors
+_orig_apply_run_postprocessors = nonebot.message._apply_run_postprocessors
+
+
+async def _timing_apply_run_preprocessors(*args: Any, **kwargs: Any) -> bool:
+    if not await _orig_apply_run_preprocessors(*args, **kwargs):
+        return False
+    # kept on the matcher instance itself, which lives exactly as long as the run
+    setattr(kwargs["matcher"], _START_ATTR, time.perf_counter_ns())
+    return True
+
+
+async def _timing_apply_run_postprocessors(*args: Any, **kwargs: Any) -> None:
+    end = time.perf_counter_ns()
+    matcher: Matcher = kwargs["matcher"]
+    start: Optional[int] = getattr(matcher, _START_ATTR, None)
+    if start is not None:
+        cls = type(matcher)
+        hist = matcher_latency.get(cls)
+        if hist is None:
+            hist = matcher_latency[cls] = LatencyHistogram()
+        hist.record(end - start)
+        if kwargs.get("exception") is not None:
+            matcher_errors[cls] = matcher_errors.get(cls, 0) + 1
+    await _orig_apply_run_postprocessors(*args, **kwargs)
+
+
+def latency_of(matcher: Type[Matcher]) -> Optional[MatcherLatencyDict]:
+    if (hist := matcher_latency.get(matcher)) is None:
+        return None
+    return MatcherLatencyDict(**hist.summary(), errors=matcher_errors.get(matcher, 0))
+
+
+@driver.on_startup
+async def patch_matcher_timing() -> None:
+    # timing between the run pre/postprocessors, i.e. the handlers of the matcher
+    # only, excluding rule/permission checks and the processors of other plugins
+    nonebot.message._apply_run_preprocessors = _timing_apply_run_preprocessors
+    nonebot.message._apply_run_postprocessors = _timing_apply_run_postprocessors
+    logger.trace("Patched run processors to time matcher handlers")
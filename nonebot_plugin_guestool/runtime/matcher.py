@@ -1,6 +1,6 @@
-from typing import Any, Dict, List, Literal, Optional, Tuple, Type, Union
-from uuid import uuid4
-from weakref import WeakValueDictionary
+from typing import Any, Dict, List, Literal, Optional, Set, Tuple, Type, Union
+from uuid import NAMESPACE_URL, uuid5
+from weakref import WeakKeyDictionary, WeakValueDictionary
 
 from nonebot import get_driver, logger
 from nonebot.internal.matcher import Matcher, matchers
@@ -21,30 +21,106 @@ from pydantic import BaseModel
 
 from nonebot_plugin_guestool.utils import model_dispatch
 
-from ..exceptions import RuleCreateError, RuleParseError
-from ..typing import AllMatchTypes
+from ..exceptions import MatcherHackError, RuleCreateError, RuleParseError
+from ..typing import AllMatchTypes, MatcherDumpDict, MatcherDumpItemDict
+from .routing import routing_index
 
 driver = get_driver()
 matcher_ids: WeakValueDictionary[str, Type[Matcher]] = WeakValueDictionary()
+matcher_id_of: "WeakKeyDictionary[Type[Matcher], str]" = WeakKeyDictionary()
+"""Reverse index of `matcher_ids`."""
+matcher_data_cache: "WeakKeyDictionary[Type[Matcher], Dict[str, Any]]" = WeakKeyDictionary()
+"""Serialized `MatcherData`, dropped when the matcher is hacked or removed."""
+matcher_site_of: "WeakKeyDictionary[Type[Matcher], Tuple[str, int]]" = WeakKeyDictionary()
+"""Definition site and index in it, which a matcher's ID is derived from."""
+_site_next: Dict[str, int] = {}
+"""Lowest index of every definition site which may still be free."""
+
+MATCHER_ID_NAMESPACE = uuid5(NAMESPACE_URL, "nonebot-plugin-guestool/matcher")
+
+
+def _matcher_site(ma: Type[Matcher]) -> str:
+    source = ma._source
+    return (
+        f"{ma.plugin_name}:{ma.module_name}:"
+        f"{source.lineno if source else None}:{ma.type}"
+    )
+
+
+def _allocate_id(site: str) -> Tuple[str, int]:
+    # indices below the hint are taken, so matchers defined in a loop do not probe
+    # every earlier index again (which is quadratic in the number of matchers)
+    n = _site_next.get(site, 0)
+    while True:
+        id = str(uuid5(MATCHER_ID_NAMESPACE, f"{site}:{n}"))
+        if id not in matcher_ids:
+            _site_next[site] = n + 1
+            return id, n
+        n += 1
+
+
+def make_matcher_id(ma: Type[Matcher]) -> str:
+    """Deterministic ID of a matcher, derived from where it is defined.
+
+    Matchers defined at the same place (e.g. in a loop) are told apart by the order
+    they are registered in, so the IDs stay the same across restarts as long as the
+    plugins do not change.
+    """
+    return _allocate_id(_matcher_site(ma))[0]
+
+
+def register_matcher(ma: Type[Matcher]) -> str:
+    """Give a matcher its ID, if it does not have one yet."""
+    if (id := matcher_id_of.get(ma)) is not None:
+        return id
+    site = _matcher_site(ma)
+    id, n = _allocate_id(site)
+    matcher_ids[id] = ma
+    matcher_id_of[ma] = id
+    matcher_site_of[ma] = (site, n)
+    return id
+
+
+def unregister_matcher(ma: Type[Matcher]) -> None:
+    if (id := matcher_id_of.pop(ma, None)) is not None:
+        matcher_ids.pop(id, None)
+    if (found := matcher_site_of.pop(ma, None)) is not None:
+        site, n = found
+        # the index is free again, the next matcher defined there takes it
+        _site_next[site] = min(_site_next.get(site, 0), n)
+
+
+def sync_matcher_ids() -> None:
+    """Register matchers added behind our back, e.g. by other matcher providers."""
+    for mas in matchers.values():
+        for ma in mas:
+            if ma not in matcher_id_of:
+                register_matcher(ma)
+
 
 _matcher_orig_setitem = MatcherManager.__setitem__
+_matcher_orig_new = Matcher.new.__func__  # type: ignore[attr-defined]
 
 
 def _patch_matcher_setitem(self: MatcherManager, key: int, value: List[Type[Matcher]]) -> None:
     _matcher_orig_setitem(self, key, value)
     for ma in value:
-        if ma in matcher_ids.values():
-            continue
-        matcher_ids[str(uuid4())] = ma
+        register_matcher(ma)
+
+
+def _patch_matcher_new(cls: Type[Matcher], *args: Any, **kwargs: Any) -> Type[Matcher]:
+    ma = _matcher_orig_new(cls, *args, **kwargs)
+    # `Matcher.new()` appends to `matchers[priority]` directly, bypassing `__setitem__`
+    register_matcher(ma)
+    return ma
 
 
 @driver.on_startup
 async def matcher_mkid() -> None:
-    for mas in matchers.values():
-        for ma in mas:
-            matcher_ids[str(uuid4())] = ma
+    sync_matcher_ids()
     MatcherManager.__setitem__ = _patch_matcher_setitem
-    logger.trace("Patched 'MatcherManager' to listen matcher creation")
+    Matcher.new = classmethod(_patch_matcher_new)  # type: ignore[method-assign, assignment]
+    logger.trace("Patched 'MatcherManager' and 'Matcher.new' to listen matcher creation")
 
 
 class RuleInfo(BaseModel):
@@ -187,6 +263,47 @@ def extract_matcher_info_by_id(id: str) -> MatcherData:
     return extract_matcher_info(matcher_ids[id])
 
 
+def serialize_matcher(ma: Type[Matcher]) -> Dict[str, Any]:
+    """`MatcherData` of a matcher as a dict, cached until the matcher is changed."""
+    if (data := matcher_data_cache.get(ma)) is None:
+        data = matcher_data_cache[ma] = extract_matcher_info(ma).dict()
+    return data
+
+
+def dump_matchers(
+    offset: int = 0,
+    limit: int = 100,
+    plugin_name: Optional[str] = None,
+    type: Optional[str] = None,
+    priority_min: Optional[int] = None,
+    priority_max: Optional[int] = None
+) -> MatcherDumpDict:
+    """A page of matchers in priority order, filtered before serializing."""
+    found: List[Type[Matcher]] = []
+    for priority in sorted(matchers.keys()):
+        if priority_min is not None and priority < priority_min:
+            continue
+        if priority_max is not None and priority > priority_max:
+            break
+        for ma in matchers[priority]:
+            if plugin_name is not None and ma.plugin_name != plugin_name:
+                continue
+            if type is not None and ma.type != type:
+                continue
+            found.append(ma)
+    offset = max(0, offset)
+    page = found[offset:offset + limit] if limit > 0 else found[offset:]
+    items: List[MatcherDumpItemDict] = []
+    for ma in page:
+        id = register_matcher(ma)
+        try:
+            items.append({"id": id, "data": serialize_matcher(ma), "error": None})
+        except Exception as e:
+            # one unparsable rule should not fail the whole page
+            items.append({"id": id, "data": None, "error": f"{e.__class__.__name__}: {e}"})
+    return {"total": len(found), "offset": offset, "matchers": items}
+
+
 # def create_matcher(dat: MatcherData):
 #     on()
 
@@ -206,6 +323,7 @@ def update_priority(ma: Type[Matcher], after: int) -> None:
     matchers[after].append(ma)
     matchers[before].remove(ma)
     ma.priority = after
+    matcher_data_cache.pop(ma, None)
     logger.info(f"Updated the priority of {ma!r} ({before} -> {after})")
     if not matchers[before]:
         del matchers[before]
@@ -217,14 +335,98 @@ def hack_matcher(ma: Type[Matcher], ch: MatcherData) -> None:
     ma.rule = ch.rule.build_matcher_rule()
     update_priority(ma, ch.priority)
     ma.block = ch.block
+    matcher_data_cache.pop(ma, None)
+    routing_index.forget(ma)
     logger.info(f"Hacked into {ma!r} with {ch!r}")
 
 
-def hack_matcher_by_id(id: str, ch: MatcherData) -> None:
-    return hack_matcher(matcher_ids[id], ch)
+def _parse_change(ch: Union[MatcherData, Dict[str, Any]]) -> MatcherData:
+    return ch if isinstance(ch, MatcherData) else MatcherData.parse_obj(ch)
+
+
+def hack_matcher_by_id(
+    id: str, ch: Union[MatcherData, Dict[str, Any], None] = None, **data: Any
+) -> None:
+    return hack_matcher(matcher_ids[id], _parse_change(data if ch is None else ch))
+
+
+def hack_matchers(changes: List[Tuple[Type[Matcher], MatcherData]]) -> None:
+    """Hack many matchers at once, either all of them or none.
+
+    Every change is validated (and its rule built) before anything is touched. The
+    priority table is rebuilt once, without any `await` in between, so events never
+    see a half-applied configuration. Any failure while applying rolls back all of
+    the changes.
+    """
+    seen: Set[Type[Matcher]] = set()
+    listed = {ma for mas in matchers.values() for ma in mas}
+    rules: List[Rule] = []
+    for ma, ch in changes:
+        if ma in seen:
+            raise MatcherHackError(f"{ma!r} is changed more than once")
+        seen.add(ma)
+        if ma not in listed:
+            raise MatcherHackError(f"{ma!r} not included in priority {ma.priority}")
+        rules.append(ch.rule.build_matcher_rule())
+
+    saved = [(ma, ma.type, ma.rule, ma.priority, ma.block) for ma, _ in changes]
+    table = {priority: list(mas) for priority, mas in matchers.items()}
+    try:
+        moved: Dict[int, List[Type[Matcher]]] = {}
+        for (ma, ch), rule in zip(changes, rules):
+            if ch.priority != ma.priority:
+                moved.setdefault(ch.priority, []).append(ma)
+            ma.type = ch.type
+            ma.rule = rule
+            ma.priority = ch.priority
+            ma.block = ch.block
+        if moved:
+            movers = {ma for mas in moved.values() for ma in mas}
+            rebuilt: Dict[int, List[Type[Matcher]]] = {}
+            for priority, mas in table.items():
+                rebuilt[priority] = [ma for ma in mas if ma not in movers]
+            for priority, mas in moved.items():
+                rebuilt.setdefault(priority, []).extend(mas)
+            for priority, mas in rebuilt.items():
+                if mas:
+                    matchers[priority] = mas
+                elif priority in matchers:
+                    del matchers[priority]
+    except Exception as e:
+        for ma, type_, rule, priority, block in saved:
+            ma.type, ma.rule, ma.priority, ma.block = type_, rule, priority, block
+        for priority in list(matchers.keys()):
+            if priority not in table:
+                del matchers[priority]
+        for priority, mas in table.items():
+            matchers[priority] = mas
+        raise MatcherHackError(f"Failed to hack matchers, rolled back: {e}") from e
+    finally:
+        for ma, _ in changes:
+            matcher_data_cache.pop(ma, None)
+            routing_index.forget(ma)
+    logger.info(f"Hacked into {len(changes)} matchers")
+
+
+def hack_matchers_by_id(changes: List[Dict[str, Any]]) -> List[str]:
+    """Hack matchers by `{"id": ..., (MatcherData fields...)}`, all or none."""
+    resolved: List[Tuple[Type[Matcher], MatcherData]] = []
+    for i, change in enumerate(changes):
+        change = dict(change)
+        id = change.pop("id", None)
+        if id is None or (ma := matcher_ids.get(id)) is None:
+            raise MatcherHackError(f"Change #{i}: unknown matcher {id!r}")
+        try:
+            resolved.append((ma, _parse_change(change.get("ch", change))))
+        except Exception as e:
+            raise MatcherHackError(f"Change #{i} of {id!r} is invalid: {e}") from e
+    hack_matchers(resolved)
+    return [change["id"] for change in changes]
 
 
 def remove_matcher_by_id(id: str) -> None:
     ma = matcher_ids[id]
     matchers[ma.priority].remove(ma)
-    del matcher_ids[id]
\ No newline at end of file
+    matcher_data_cache.pop(ma, None)
+    routing_index.forget(ma)
+    unregister_matcher(ma)
\ No newline at end of file
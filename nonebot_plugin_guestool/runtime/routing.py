@@ -0,0 +1,269 @@
+import weakref
+from itertools import count
+from typing import Any, Dict, Optional, Set, Tuple, Type
+from weakref import WeakKeyDictionary
+
+from nonebot import get_driver, logger
+from nonebot.adapters import Bot, Event
+from nonebot.consts import CMD_KEY, PREFIX_KEY
+from nonebot.internal.matcher import Matcher
+from nonebot.internal.rule import Rule
+from nonebot.rule import (
+    CommandRule,
+    EndswithRule,
+    FullmatchRule,
+    KeywordsRule,
+    RegexRule,
+    StartswithRule,
+)
+
+from ..config import Config
+from ..textindex import AhoCorasick, PrefixTrie, required_literals
+from ..typing import RoutingInfoDict
+
+driver = get_driver()
+
+lconfig = Config(**driver.config.dict())
+"""本插件配置信息。"""
+
+_EVENT_CACHE_SIZE = 32
+
+
+class _Gate:
+    """A rule checker of a matcher which must pass for its rule to pass."""
+
+    __slots__ = ("rule", "token", "kind", "keys", "finalizer")
+
+    def __init__(self, rule: Rule, token: int, kind: Optional[str], keys: Tuple[Any, ...]) -> None:
+        self.rule = rule
+        self.token = token
+        self.kind = kind
+        self.keys = keys
+        self.finalizer: Optional[weakref.finalize] = None
+
+
+def _find_gate(rule: Rule) -> Tuple[Optional[str], Tuple[Any, ...]]:
+    regex: Tuple[str, ...] = ()
+    for checker in rule.checkers:
+        call = checker.call
+        if isinstance(call, RegexRule):
+            # only if nothing cheaper to look up is there
+            if not regex and lconfig.guest_routing_regex:
+                regex = tuple(required_literals(call.regex, call.flags) or ())
+        elif isinstance(call, StartswithRule) and not call.ignorecase:
+            return "startswith", call.msg
+        elif isinstance(call, EndswithRule) and not call.ignorecase:
+            return "endswith", call.msg
+        elif isinstance(call, FullmatchRule):
+            # the literals are already casefolded when ignoring case
+            return ("fullmatch_ci" if call.ignorecase else "fullmatch"), call.msg
+        elif isinstance(call, KeywordsRule):
+            return "keywords", call.keywords
+        elif isinstance(call, CommandRule):
+            return "command", tuple(call.cmds)
+    if regex:
+        return "regex", regex
+    # regexes without required literals and case-insensitive startswith/endswith
+    # rules (whose case folding is `re.IGNORECASE`'s) are not indexed
+    return None, ()
+
+
+class RoutingIndex:
+    """Index of the literals in message matchers' rules, skipping hopeless checks.
+
+    Every matcher is indexed by one of its rule checkers (startswith, endswith,
+    fullmatch, keywords, command, or the literals required by a regex) which must
+    pass for its rule to pass. For each
+    message, the matchers whose checker can pass are looked up once, and the rules
+    of all other matchers are not checked at all.
+
+    Matchers are indexed lazily on their first check, and again when their rule is
+    replaced (e.g. by hacking).
+    """
+
+    def __init__(self) -> None:
+        self.gates: "WeakKeyDictionary[Type[Matcher], _Gate]" = WeakKeyDictionary()
+        self._tokens = count()
+        self._starts: PrefixTrie[int] = PrefixTrie()
+        self._ends: PrefixTrie[int] = PrefixTrie()
+        self._full: Dict[str, Set[int]] = {}
+        self._full_ci: Dict[str, Set[int]] = {}
+        self._keywords: AhoCorasick[int] = AhoCorasick()
+        self._regex: AhoCorasick[int] = AhoCorasick()
+        """Required literals of regexes, searched in the whole message (not plain text)."""
+        self.version = 0
+        self._events: Dict[int, Tuple[Event, int, Optional[Set[int]]]] = {}
+        self.events = 0
+        self.checks = 0
+        self.skipped = 0
+        self.checked_kinds: Dict[str, int] = {}
+        self.skipped_kinds: Dict[str, int] = {}
+
+    def _add(self, gate: _Gate) -> None:
+        for key in gate.keys:
+            if gate.kind == "startswith":
+                self._starts.add(key, gate.token)
+            elif gate.kind == "endswith":
+                self._ends.add(key[::-1], gate.token)
+            elif gate.kind == "fullmatch":
+                self._full.setdefault(key, set()).add(gate.token)
+            elif gate.kind == "fullmatch_ci":
+                self._full_ci.setdefault(key, set()).add(gate.token)
+            elif gate.kind == "keywords":
+                self._keywords.add(key, gate.token)
+            elif gate.kind == "regex":
+                self._regex.add(key, gate.token)
+        self.version += 1
+
+    def _remove(self, gate: _Gate) -> None:
+        if gate.finalizer is not None:
+            gate.finalizer.detach()
+        for key in gate.keys:
+            if gate.kind == "startswith":
+                self._starts.discard(key, gate.token)
+            elif gate.kind == "endswith":
+                self._ends.discard(key[::-1], gate.token)
+            elif gate.kind in ("fullmatch", "fullmatch_ci"):
+                table = self._full if gate.kind == "fullmatch" else self._full_ci
+                if (tokens := table.get(key)) is not None:
+                    tokens.discard(gate.token)
+                    if not tokens:
+                        del table[key]
+            elif gate.kind == "keywords":
+                self._keywords.discard(key, gate.token)
+            elif gate.kind == "regex":
+                self._regex.discard(key, gate.token)
+        self.version += 1
+
+    def gate_of(self, matcher: Type[Matcher]) -> _Gate:
+        gate = self.gates.get(matcher)
+        if gate is not None and gate.rule is matcher.rule:
+            return gate
+        if gate is not None:
+            self._remove(gate)
+        kind, keys = _find_gate(matcher.rule)
+        gate = _Gate(matcher.rule, next(self._tokens), kind, keys)
+        if kind not in (None, "command"):
+            self._add(gate)
+            gate.finalizer = weakref.finalize(matcher, self._remove, gate)
+        self.gates[matcher] = gate
+        return gate
+
+    def forget(self, matcher: Type[Matcher]) -> None:
+        if (gate := self.gates.pop(matcher, None)) is not None:
+            self._remove(gate)
+
+    def candidates(self, event: Event) -> Optional[Set[int]]:
+        """Tokens of the indexed matchers which may match the event, `None` if all."""
+        key = id(event)
+        cached = self._events.get(key)
+        if cached is not None and cached[0] is event:
+            if cached[1] == self.version:
+                return cached[2]
+        else:
+            self.events += 1
+        found: Optional[Set[int]]
+        try:
+            text = event.get_plaintext()
+            # `RegexRule` searches the string form of the whole message instead
+            message = str(event.get_message()) if self._regex.size else ""
+        except Exception:
+            found = None
+        else:
+            found = set()
+            self._starts.prefixes_of(text, found)
+            self._ends.prefixes_of(reversed(text), found)
+            if text.endswith("\n"):
+                # `EndswithRule` searches `(?:...)$`, which matches before a final "\n"
+                self._ends.prefixes_of(reversed(text[:-1]), found)
+            if text:
+                found |= self._full.get(text, set())
+                found |= self._full_ci.get(text.casefold(), set())
+            self._keywords.search(text, found)
+            if message:
+                self._regex.search(message, found)
+        if len(self._events) >= _EVENT_CACHE_SIZE and key not in self._events:
+            del self._events[next(iter(self._events))]
+        self._events[key] = (event, self.version, found)
+        return found
+
+    def allows(self, matcher: Type[Matcher], event: Event, state: Dict[Any, Any]) -> bool:
+        """Whether the rule of the matcher may pass, i.e. should be checked."""
+        gate = self.gate_of(matcher)
+        if gate.kind is None:
+            allowed = True
+        elif gate.kind == "command":
+            prefix = state.get(PREFIX_KEY)
+            allowed = prefix is None or prefix.get(CMD_KEY) in gate.keys
+        else:
+            found = self.candidates(event)
+            allowed = found is None or gate.token in found
+        kinds = self.checked_kinds if allowed else self.skipped_kinds
+        kind = gate.kind or "unindexed"
+        kinds[kind] = kinds.get(kind, 0) + 1
+        return allowed
+
+    def stats(self) -> RoutingInfoDict:
+        """Indexed matchers and skipped rule checks"""
+        kinds: Dict[str, int] = {}
+        for gate in self.gates.values():
+            kinds[gate.kind or "unindexed"] = kinds.get(gate.kind or "unindexed", 0) + 1
+        return {
+            "enabled": routing_enabled,
+            "matchers": kinds,
+            "events": self.events,
+            "checks": self.checks,
+            "skipped": self.skipped,
+            "skip_ratio": self.skipped / self.checks if self.checks else 0.,
+            "checked_by_kind": dict(self.checked_kinds),
+            "skipped_by_kind": dict(self.skipped_kinds)
+        }
+
+
+routing_index = RoutingIndex()
+routing_enabled = False
+
+_orig_check_rule = Matcher.check_rule.__func__  # type: ignore[attr-defined]
+
+
+async def _routed_check_rule(
+    cls: Type[Matcher],
+    bot: Bot,
+    event: Event,
+    state: Dict[Any, Any],
+    *args: Any,
+    **kwargs: Any
+) -> bool:
+    routing_index.checks += 1
+    if cls.type and event.get_type() != cls.type:
+        return False
+    if not routing_index.allows(cls, event, state):
+        routing_index.skipped += 1
+        return False
+    return await _orig_check_rule(cls, bot, event, state, *args, **kwargs)
+
+
+def enable_routing() -> None:
+    global routing_enabled
+    from nonebot.matcher import matchers
+
+    # indexing everything at once, so the first messages don't rebuild the index
+    # for every matcher they are checked against
+    for mas in matchers.values():
+        for ma in mas:
+            routing_index.gate_of(ma)
+    Matcher.check_rule = classmethod(_routed_check_rule)  # type: ignore[method-assign, assignment]
+    routing_enabled = True
+    logger.trace("Patched 'Matcher.check_rule' to route messages by rule literals")
+
+
+def disable_routing() -> None:
+    global routing_enabled
+    Matcher.check_rule = classmethod(_orig_check_rule)  # type: ignore[method-assign, assignment]
+    routing_enabled = False
+
+
+@driver.on_startup
+async def init_routing() -> None:
+    if lconfig.guest_routing_index:
+        enable_routing()
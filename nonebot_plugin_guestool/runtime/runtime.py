@@ -1,23 +1,136 @@
 import time
-from typing import Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
-from nonebot import get_driver, on
+import nonebot.message
+from nonebot import get_driver, logger
 from nonebot.adapters import Bot, Event
 
+from ..histogram import LatencyHistogram
+from ..typing import ApiCallDetailDict, CounterDeltaDict, LatencySummaryDict
+
 bot_connect_time: Dict[str, float] = {}
 recv_num: Dict[str, Dict[str, int]] = {}
 apicall_num: Dict[str, Dict[str, int]] = {}
+"""Successful API calls."""
+apicall_latency: Dict[str, Dict[str, LatencyHistogram]] = {}
+"""Latency of API calls, successful or not."""
+apicall_errors: Dict[str, Dict[str, Dict[str, int]]] = {}
+"""Failed API calls by exception type."""
+apicall_inflight: Dict[int, Tuple[Dict[str, Any], str, str, int]] = {}
+"""API calls not returned yet, keyed by the ID of their data (kept alive here)."""
+
+INFLIGHT_STALE_NS = 600 * 10**9
+"""Calls cancelled before returning never reach `called_api`, drop them eventually."""
+
+counter_base_version = time.time_ns() // 1000
+"""Version of the counters when the guest started, older cursors need a full resync."""
+counter_version = counter_base_version
+"""Monotonic version of `recv_num` and `apicall_num`, bumped on every change."""
+recv_version: Dict[str, Dict[str, int]] = {}
+apicall_version: Dict[str, Dict[str, int]] = {}
 
 driver = get_driver()
 
 
-async def called_api(bot: Bot, exc: Optional[Exception], api: str, _, __):
+def _count(
+    counters: Dict[str, Dict[str, int]],
+    versions: Dict[str, Dict[str, int]],
+    bot_id: str,
+    key: str,
+    inc: int = 1
+) -> None:
+    global counter_version
+    counter_version += 1
+    # no `setdefault()` here as it would build a throwaway dict for every event
+    bot_counters = counters.get(bot_id)
+    if bot_counters is None:
+        bot_counters = counters[bot_id] = {}
+    bot_counters[key] = bot_counters.get(key, 0) + inc
+    bot_versions = versions.get(bot_id)
+    if bot_versions is None:
+        bot_versions = versions[bot_id] = {}
+    bot_versions[key] = counter_version
+
+
+def counter_delta(
+    counters: Dict[str, Dict[str, int]],
+    versions: Dict[str, Dict[str, int]],
+    since: int
+) -> CounterDeltaDict:
+    """Counter entries changed after version `since`.
+
+    Cursors from before the guest started (or not issued by this guest) get a full
+    resync instead, marked by `full`.
+    """
+    if not counter_base_version <= since <= counter_version:
+        return {
+            "version": counter_version,
+            "full": True,
+            "data": {bot: dict(cnt) for bot, cnt in counters.items()}
+        }
+    data: Dict[str, Dict[str, int]] = {}
+    for bot, vers in versions.items():
+        changed = {key: counters[bot][key] for key, ver in vers.items() if ver > since}
+        if changed:
+            data[bot] = changed
+    return {"version": counter_version, "full": False, "data": data}
+
+
+def _prune_inflight(now: int) -> None:
+    # calls are inserted in the order they started, so the stale ones come first
+    while apicall_inflight:
+        key = next(iter(apicall_inflight))
+        if now - apicall_inflight[key][3] <= INFLIGHT_STALE_NS:
+            break
+        del apicall_inflight[key]
+
+
+async def calling_api(bot: Bot, api: str, data: Dict[str, Any]):
+    now = time.perf_counter_ns()
+    _prune_inflight(now)
+    # the same `data` dict is passed to both hooks of a call
+    apicall_inflight[id(data)] = (data, bot.self_id, api, now)
+
+
+async def called_api(bot: Bot, exc: Optional[Exception], api: str, data: Dict[str, Any], _):
+    end = time.perf_counter_ns()
+    bot_id = bot.self_id
+    call = apicall_inflight.pop(id(data), None)
+    if call is not None and call[0] is data:
+        bot_latency = apicall_latency.get(bot_id)
+        if bot_latency is None:
+            bot_latency = apicall_latency[bot_id] = {}
+        hist = bot_latency.get(api)
+        if hist is None:
+            hist = bot_latency[api] = LatencyHistogram()
+        hist.record(end - call[3])
+
     if exc:
+        bot_errors = apicall_errors.setdefault(bot_id, {}).setdefault(api, {})
+        name = type(exc).__qualname__
+        bot_errors[name] = bot_errors.get(name, 0) + 1
         return
 
-    apicall_num.setdefault(bot.self_id, {})
-    apicall_num[bot.self_id].setdefault(api, 0)
-    apicall_num[bot.self_id][api] += 1
+    _count(apicall_num, apicall_version, bot_id, api)
+
+
+def apicall_detail(calls: Any) -> ApiCallDetailDict:
+    """Latency, errors and in-flight counts of API calls along with `calls`."""
+    now = time.perf_counter_ns()
+    inflight: Dict[str, Dict[str, int]] = {}
+    _prune_inflight(now)
+    for _, bot_id, api, _ in apicall_inflight.values():
+        bot_inflight = inflight.setdefault(bot_id, {})
+        bot_inflight[api] = bot_inflight.get(api, 0) + 1
+    latency: Dict[str, Dict[str, LatencySummaryDict]] = {
+        bot: {api: hist.summary() for api, hist in hists.items()}
+        for bot, hists in apicall_latency.items()
+    }
+    errors = {
+        bot: {api: dict(excs) for api, excs in apis.items()}
+        for bot, apis in apicall_errors.items()
+    }
+    return {"calls": calls, "latency": latency, "errors": errors, "inflight": inflight}
 
 
 @driver.on_bot_connect
@@ -29,17 +142,32 @@ async def _(bot: Bot):
         apicall_num[bot_id] = {}
 
     if bot_id not in recv_num:
-        recv_num[bot_id] = {"metaevent": 0, "message": 0, "notice": 0, "request": 0}
+        for name in ("metaevent", "message", "notice", "request"):
+            _count(recv_num, recv_version, bot_id, name, 0)
 
+    bot.on_calling_api(calling_api)
     bot.on_called_api(called_api)
 
 
 def add_recv(bot: Bot, event: Event):
-    name = event.__class__.__qualname__
+    _count(recv_num, recv_version, bot.self_id, type(event).__qualname__)
+
+
+_orig_apply_event_preprocessors = nonebot.message._apply_event_preprocessors
+
 
-    recv_num.setdefault(bot.self_id, {})
-    recv_num[bot.self_id].setdefault(name, 0)
-    recv_num[bot.self_id][name] += 1
+async def _counting_apply_event_preprocessors(
+    bot: Bot, event: Event, *args: Any, **kwargs: Any
+) -> bool:
+    if not await _orig_apply_event_preprocessors(bot, event, *args, **kwargs):
+        return False
+    add_recv(bot, event)
+    return True
 
 
-recv_matcher = on(handlers=[add_recv], priority=0, block=False)
\ No newline at end of file
+@driver.on_startup
+async def patch_event_counting() -> None:
+    # counting in the event preprocessing step directly, instead of a matcher which
+    # needs rule/permission checks and dependency injection for every event
+    nonebot.message._apply_event_preprocessors = _counting_apply_event_preprocessors
+    logger.trace("Patched event preprocessing to count received events")
@@ -0,0 +1,178 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import suppress
+from typing import TYPE_CHECKING, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import psutil
+from nonebot import get_driver, logger
+
+from .config import Config
+from .typing import DiskIODict, MetricsSampleDict, NetworkIODict
+
+if TYPE_CHECKING:
+    import psutil._common
+
+driver = get_driver()
+
+lconfig = Config(**driver.config.dict())
+"""本插件配置信息。"""
+
+
+class MetricsSnapshot(NamedTuple):
+    timestamp: float
+    cpu_times: "psutil._common.scputimes"
+    cpu_percent: float
+    disk_io: Dict[str, "psutil._common.sdiskio"]
+    network_io: Dict[str, "psutil._common.snetio"]
+
+
+def cpu_percent_between(
+    ref: "psutil._common.scputimes", cur: "psutil._common.scputimes"
+) -> float:
+    """System-wide CPU usage between two `psutil.cpu_times()` snapshots.
+
+    Computed like `psutil.cpu_percent()`, but without its baseline, which is shared
+    by every caller on the same thread and so reset by any of them.
+    """
+    def busy_and_total(times: "psutil._common.scputimes") -> Tuple[float, float]:
+        # guest time is already included in user time on Linux
+        total = sum(times) - getattr(times, "guest", 0) - getattr(times, "guest_nice", 0)
+        return total - times.idle - getattr(times, "iowait", 0), total
+
+    ref_busy, ref_total = busy_and_total(ref)
+    cur_busy, cur_total = busy_and_total(cur)
+    if cur_total <= ref_total:
+        return 0.
+    percent = (cur_busy - ref_busy) / (cur_total - ref_total) * 100
+    return round(min(100., max(0., percent)), 1)
+
+
+def _take_snapshot(ref: Optional[MetricsSnapshot] = None) -> MetricsSnapshot:
+    cpu_times = psutil.cpu_times()
+    return MetricsSnapshot(
+        timestamp=time.time(),
+        cpu_times=cpu_times,
+        cpu_percent=cpu_percent_between(ref.cpu_times, cpu_times) if ref else 0.,
+        disk_io=psutil.disk_io_counters(True) or {},
+        network_io=psutil.net_io_counters(True) or {}
+    )
+
+
+def diff_disk_io(
+    ref: Dict[str, "psutil._common.sdiskio"], cur: Dict[str, "psutil._common.sdiskio"]
+) -> List[DiskIODict]:
+    return [
+        {
+            "device": dev,
+            "read_bytes": cur[dev].read_bytes - ref[dev].read_bytes,
+            "write_bytes": cur[dev].write_bytes - ref[dev].write_bytes
+        }
+        for dev in ref if dev in cur
+    ]
+
+
+def diff_network_io(
+    ref: Dict[str, "psutil._common.snetio"], cur: Dict[str, "psutil._common.snetio"]
+) -> List[NetworkIODict]:
+    return [
+        {
+            "device": dev,
+            "sent_bytes": cur[dev].bytes_sent - ref[dev].bytes_sent,
+            "recv_bytes": cur[dev].bytes_recv - ref[dev].bytes_recv
+        }
+        for dev in ref if dev in cur
+    ]
+
+
+class MetricsSampler:
+    """Background sampler which snapshots psutil counters on a fixed interval.
+
+    Snapshots are kept in a ring buffer, so info requests can read precomputed
+    deltas immediately instead of sleeping for their own sampling window.
+    """
+
+    def __init__(self, interval: float, size: int) -> None:
+        self.interval = interval
+        self.snapshots: Deque[MetricsSnapshot] = deque(maxlen=max(2, size + 1))
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def ready(self) -> bool:
+        """Whether at least one full sampling window is available."""
+        return self.running and len(self.snapshots) >= 2
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.snapshots.clear()
+        self.snapshots.append(_take_snapshot())
+        self._task = asyncio.create_task(self._loop())
+        logger.debug(f"Started metrics sampler with interval {self.interval}s")
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.interval
+            # keep ticks on a fixed grid so processing time won't drift them
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+            try:
+                self.snapshots.append(_take_snapshot(self.snapshots[-1]))
+            except Exception as e:
+                logger.opt(exception=e).warning("Failed to take a metrics snapshot")
+
+    def recent(self, window: int = 1) -> List[MetricsSampleDict]:
+        """Recent samples, oldest first, at most `window` of them."""
+        if window <= 0:
+            return []
+        snaps = list(self.snapshots)[-(window + 1):]
+        return [
+            {
+                "timestamp": cur.timestamp,
+                "interval": cur.timestamp - ref.timestamp,
+                "cpu_percent": cur.cpu_percent,
+                "disk_io": diff_disk_io(ref.disk_io, cur.disk_io),
+                "network_io": diff_network_io(ref.network_io, cur.network_io)
+            }
+            for ref, cur in zip(snaps, snaps[1:])
+        ]
+
+    def latest_cpu_percent(self) -> float:
+        return self.snapshots[-1].cpu_percent
+
+    def latest_disk_io(self) -> List[DiskIODict]:
+        ref, cur = self.snapshots[-2], self.snapshots[-1]
+        return diff_disk_io(ref.disk_io, cur.disk_io)
+
+    def latest_network_io(self) -> List[NetworkIODict]:
+        ref, cur = self.snapshots[-2], self.snapshots[-1]
+        return diff_network_io(ref.network_io, cur.network_io)
+
+
+sampler = MetricsSampler(
+    lconfig.guest_sampler_interval, lconfig.guest_sampler_size
+)
+
+
+@driver.on_startup
+async def start_sampler() -> None:
+    if lconfig.guest_sampler_interval > 0:
+        sampler.start()
+
+
+@driver.on_shutdown
+async def stop_sampler() -> None:
+    await sampler.stop()
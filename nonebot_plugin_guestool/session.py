@@ -0,0 +1,48 @@
+import random
+from collections import deque
+from typing import Deque, Iterator, List
+from uuid import uuid4
+
+from .typing import ConnectionMessageDict
+
+
+class ReplayBuffer:
+    """Outbound reports of a session which are not acknowledged by the host yet.
+
+    Every report gets a sequence number (`opsq`). When the guest reconnects and the
+    host resumes the session, the reports after the host's last acknowledged
+    sequence number are sent again. The buffer is bounded, the oldest reports are
+    dropped first.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.session = str(uuid4())
+        self.seq = 0
+        self.messages: Deque[ConnectionMessageDict] = deque(maxlen=max(0, size))
+
+    def push(self, data: ConnectionMessageDict) -> ConnectionMessageDict:
+        self.seq += 1
+        data["opsq"] = self.seq
+        self.messages.append(data)
+        return data
+
+    def ack(self, seq: int) -> None:
+        while self.messages and self.messages[0]["opsq"] <= seq:
+            self.messages.popleft()
+
+    def pending(self, after: int) -> List[ConnectionMessageDict]:
+        return [x for x in self.messages if x["opsq"] > after]
+
+    def reset(self) -> None:
+        """Start a new session, dropping all buffered reports."""
+        self.session = str(uuid4())
+        self.seq = 0
+        self.messages.clear()
+
+
+def backoff_delays(base: float, cap: float) -> Iterator[float]:
+    """Exponential backoff delays with jitter, between half and all of the step."""
+    step = base
+    while True:
+        yield random.uniform(step / 2, step)
+        step = min(cap, step * 2)
@@ -0,0 +1,90 @@
+import asyncio
+import math
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from nonebot import logger
+
+from .typing import ConnectionMessageDict
+
+
+class Subscription:
+    def __init__(self, name: str, interval: float, params: Dict[str, Any]) -> None:
+        self.id = str(uuid4())
+        self.name = name
+        self.interval = interval
+        self.params = params
+        self.task: Optional[asyncio.Task] = None
+
+
+class SubscriptionManager:
+    """Periodic info reports pushed by the guest without being polled.
+
+    Every subscription runs its own loop on a fixed time grid and pushes
+    `/event/report/info` messages tagged with the subscription ID (`sbid`).
+    """
+
+    def __init__(
+        self,
+        run: Callable[[str, Dict[str, Any]], Awaitable[Any]],
+        send: Callable[[ConnectionMessageDict], Awaitable[None]],
+        min_interval: float,
+        limit: int
+    ) -> None:
+        self._run = run
+        self._send = send
+        self.min_interval = min_interval
+        self.limit = limit
+        self.subscriptions: Dict[str, Subscription] = {}
+
+    def subscribe(self, name: str, interval: float, params: Dict[str, Any]) -> Subscription:
+        try:
+            interval = float(interval)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid interval {interval!r}") from None
+        if not math.isfinite(interval):
+            raise ValueError(f"invalid interval {interval!r}")
+        if len(self.subscriptions) >= self.limit:
+            raise ValueError(f"too many subscriptions (limit {self.limit})")
+        sub = Subscription(name, max(interval, self.min_interval), params)
+        sub.task = asyncio.create_task(self._loop(sub))
+        self.subscriptions[sub.id] = sub
+        logger.debug(f"Subscribed info {name!r} every {sub.interval}s as {sub.id}")
+        return sub
+
+    def unsubscribe(self, sbid: Optional[str] = None) -> List[str]:
+        """Cancel a subscription by its ID, or all of them if no ID is given."""
+        ids = list(self.subscriptions) if sbid is None else [sbid]
+        removed = []
+        for x in ids:
+            if sub := self.subscriptions.pop(x, None):
+                if sub.task:
+                    sub.task.cancel()
+                removed.append(x)
+        return removed
+
+    def cancel_all(self) -> None:
+        self.unsubscribe()
+
+    async def _loop(self, sub: Subscription) -> None:
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            try:
+                res = await self._run(sub.name, sub.params)
+            except Exception as e:
+                logger.opt(exception=e).warning(f"Subscribed info {sub.name!r} failed")
+                res = {"error": f"{e.__class__.__name__}: {e}"}
+            try:
+                await self._send(
+                    ConnectionMessageDict(
+                        opid=str(uuid4()), opnm="/event/report/info", opct=res, sbid=sub.id
+                    )
+                )
+            except Exception as e:
+                logger.opt(exception=e).debug(f"Stopped subscription {sub.id}")
+                self.subscriptions.pop(sub.id, None)
+                return
+            # skip the ticks missed by a slow info op instead of bursting
+            next_tick = max(next_tick + sub.interval, loop.time())
+            await asyncio.sleep(next_tick - loop.time())
@@ -0,0 +1,230 @@
+import re
+from collections import deque
+from typing import Any, Deque, Dict, FrozenSet, Generic, Hashable, Iterable, List, Optional, Set, TypeVar
+
+try:
+    import re._parser as sre_parse  # type: ignore[import]
+except ImportError:  # Python < 3.11
+    import sre_parse  # type: ignore[no-redef]
+
+T = TypeVar("T", bound=Hashable)
+
+_ALTERNATIVES_LIMIT = 32
+"""Largest set of alternative literals kept when expanding a regex."""
+_REPEATS = tuple(
+    op for op in (
+        sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, "POSSESSIVE_REPEAT", None)
+    ) if op is not None
+)
+_ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)
+_ZERO_WIDTH = (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT)
+
+
+class _Node(Generic[T]):
+    __slots__ = ("children", "values", "fail", "outputs")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node[T]"] = {}
+        self.values: Set[T] = set()
+        self.fail: Optional["_Node[T]"] = None
+        self.outputs: List[T] = []
+
+
+class PrefixTrie(Generic[T]):
+    """Values stored under string keys, looked up by all keys prefixing a text."""
+
+    def __init__(self) -> None:
+        self._root: _Node[T] = _Node()
+        self.size = 0
+
+    def add(self, key: str, value: T) -> None:
+        node = self._root
+        for ch in key:
+            node = node.children.setdefault(ch, _Node())
+        if value not in node.values:
+            node.values.add(value)
+            self.size += 1
+
+    def discard(self, key: str, value: T) -> None:
+        # empty nodes are left behind, they only cost memory until the next rebuild
+        node = self._root
+        for ch in key:
+            if (child := node.children.get(ch)) is None:
+                return
+            node = child
+        if value in node.values:
+            node.values.discard(value)
+            self.size -= 1
+
+    def prefixes_of(self, text: Iterable[str], found: Set[T]) -> None:
+        """Add the values of all keys which `text` starts with to `found`."""
+        node = self._root
+        found |= node.values
+        for ch in text:
+            if (child := node.children.get(ch)) is None:
+                return
+            node = child
+            found |= node.values
+
+
+class AhoCorasick(Generic[T]):
+    """Values stored under string keys, looked up by all keys occurring in a text.
+
+    Keys are added and removed incrementally, the automaton (failure links) is
+    rebuilt on the next search after a change.
+    """
+
+    def __init__(self) -> None:
+        self._keys: Dict[str, Set[T]] = {}
+        self._root: _Node[T] = _Node()
+        self._dirty = False
+        self.size = 0
+
+    def add(self, key: str, value: T) -> None:
+        values = self._keys.setdefault(key, set())
+        if value not in values:
+            values.add(value)
+            self.size += 1
+            self._dirty = True
+
+    def discard(self, key: str, value: T) -> None:
+        if (values := self._keys.get(key)) is None or value not in values:
+            return
+        values.discard(value)
+        self.size -= 1
+        if not values:
+            del self._keys[key]
+        self._dirty = True
+
+    def _build(self) -> None:
+        root: _Node[T] = _Node()
+        for key, values in self._keys.items():
+            node = root
+            for ch in key:
+                node = node.children.setdefault(ch, _Node())
+            node.values |= values
+        queue: Deque[_Node[T]] = deque()
+        root.outputs = list(root.values)
+        for child in root.children.values():
+            child.fail = root
+            child.outputs = list(child.values)
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for ch, child in node.children.items():
+                fail = node.fail
+                while fail is not None and ch not in fail.children:
+                    fail = fail.fail
+                child.fail = fail.children[ch] if fail is not None else root
+                child.outputs = list(child.values) + child.fail.outputs
+                queue.append(child)
+        self._root = root
+        self._dirty = False
+
+    def search(self, text: str, found: Set[T]) -> None:
+        """Add the values of all keys occurring in `text` to `found`."""
+        if self._dirty:
+            self._build()
+        root = node = self._root
+        found.update(root.outputs)
+        for ch in text:
+            while ch not in node.children and node is not root:
+                node = node.fail  # type: ignore[assignment]
+            node = node.children.get(ch, root)
+            if node.outputs:
+                found.update(node.outputs)
+
+
+def _concat(left: Optional[Set[str]], right: Set[str]) -> Optional[Set[str]]:
+    if left is None:
+        return set(right)
+    if len(left) * len(right) > _ALTERNATIVES_LIMIT:
+        return None
+    return {x + y for x in left for y in right}
+
+
+def _exact(items: Any) -> Optional[Set[str]]:
+    """All strings matched by a regex (sub)pattern, if it is a small finite set."""
+    result: Set[str] = {""}
+    for op, av in items:
+        alts: Optional[Set[str]]
+        if op is sre_parse.LITERAL:
+            alts = {chr(av)}
+        elif op is sre_parse.IN and all(x is sre_parse.LITERAL for x, _ in av):
+            alts = {chr(v) for _, v in av}
+        elif op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+            alts = _exact(av[3])
+        elif op is sre_parse.BRANCH:
+            alts = set()
+            for branch in av[1]:
+                if (sub := _exact(branch)) is None:
+                    return None
+                alts |= sub
+        elif op in _ZERO_WIDTH:
+            continue
+        else:
+            return None
+        if alts is None or (joined := _concat(result, alts)) is None:
+            return None
+        result = joined
+    return result
+
+
+def _required(items: Any) -> Optional[FrozenSet[str]]:
+    """Literals of which at least one occurs in any text matching the (sub)pattern."""
+    candidates: List[Set[str]] = []
+    run: Optional[Set[str]] = None
+
+    def flush() -> None:
+        nonlocal run
+        if run and "" not in run:
+            candidates.append(run)
+        run = None
+
+    for op, av in items:
+        if op in _ZERO_WIDTH:
+            # zero-width, the literals around it are still adjacent in the text
+            continue
+        if (alts := _exact([(op, av)])) is not None:
+            if (joined := _concat(run, alts)) is None:
+                flush()
+                joined = alts
+            run = joined
+            continue
+        flush()
+        if op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+            sub = _required(av[3])
+        elif op is _ATOMIC_GROUP:
+            sub = _required(av)
+        elif op in _REPEATS and av[0] >= 1:
+            sub = _required(av[2])
+        elif op is sre_parse.BRANCH:
+            subs = [_required(branch) for branch in av[1]]
+            sub = frozenset().union(*subs) if all(subs) else None  # type: ignore[arg-type]
+        else:
+            sub = None
+        if sub:
+            candidates.append(set(sub))
+    flush()
+    if not candidates:
+        return None
+    # the most selective requirement: longest shortest alternative, then fewest
+    best = max(candidates, key=lambda x: (min(map(len, x)), -len(x)))
+    return frozenset(best)
+
+
+def required_literals(pattern: str, flags: int = 0) -> Optional[FrozenSet[str]]:
+    """Literals of which at least one occurs in any text `re.search(pattern)` matches.
+
+    Returns `None` when nothing can be told, e.g. for case-insensitive patterns or
+    patterns without mandatory literal text.
+    """
+    if not isinstance(pattern, str):
+        return None
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except (re.error, RecursionError):
+        return None
+    if (flags | parsed.state.flags) & re.IGNORECASE:
+        return None
+    return _required(parsed)
@@ -1,4 +1,4 @@
-from typing import Any, Dict, Literal, TypedDict, Union
+from typing import Any, Dict, List, Literal, Mapping, Optional, TypedDict, Union
 
 
 class _PythonVersionInfoDict(TypedDict):
@@ -55,7 +55,8 @@ class PartitionNormalInfoDict(TypedDict):
     mountpoint: str
     filesystem: str
     usage: _StorageStatDict
-    error: Literal[None]
+    """last known usage if `error` is set"""
+    error: Optional[str]
 
 
 class PartitionErrorInfoDict(TypedDict):
@@ -81,6 +82,14 @@ class NetworkIODict(TypedDict):
     recv_bytes: int
 
 
+class MetricsSampleDict(TypedDict):
+    timestamp: float
+    interval: float
+    cpu_percent: float
+    disk_io: List[DiskIODict]
+    network_io: List[NetworkIODict]
+
+
 class ProcessInfoDict(TypedDict):
     pid: int
     name: str
@@ -90,6 +99,9 @@ class ProcessInfoDict(TypedDict):
     mem: int
 
 
+ProcessSortKey = Literal["cpu", "mem", "age"]
+
+
 class PlatformInfoDict(TypedDict):
     summary: str
     system: str
@@ -104,10 +116,205 @@ class TimeInfoDict(TypedDict):
     nonebot_ts: float
 
 
-class ConnectionMessageDict(TypedDict):
+class CounterDeltaDict(TypedDict):
+    version: int
+    full: bool
+    data: Dict[str, Dict[str, int]]
+
+
+class CoalesceStatDict(TypedDict):
+    hits: int
+    misses: int
+    cache_hits: int
+
+
+class CoalesceInfoDict(TypedDict):
+    ops: Dict[str, CoalesceStatDict]
+    inflight: int
+    cached: int
+
+
+class LatencySummaryDict(TypedDict):
+    count: int
+    p50: float
+    p90: float
+    p99: float
+    max: float
+    mean: float
+
+
+class MatcherLatencyDict(LatencySummaryDict):
+    errors: int
+
+
+class ApiCallDetailDict(TypedDict):
+    calls: Union[Dict[str, Dict[str, int]], CounterDeltaDict]
+    latency: Dict[str, Dict[str, LatencySummaryDict]]
+    errors: Dict[str, Dict[str, Dict[str, int]]]
+    inflight: Dict[str, Dict[str, int]]
+
+
+class RoutingInfoDict(TypedDict):
+    enabled: bool
+    matchers: Dict[str, int]
+    events: int
+    checks: int
+    skipped: int
+    skip_ratio: float
+    checked_by_kind: Dict[str, int]
+    skipped_by_kind: Dict[str, int]
+
+
+class SlowCallbackDict(TypedDict):
+    timestamp: float
+    duration: float
+    source: Optional[str]
+    task: Optional[str]
+    coroutine: Optional[str]
+    stack: List[str]
+
+
+class EventLoopInfoDict(TypedDict):
+    enabled: bool
+    interval: float
+    threshold: float
+    lag: LatencySummaryDict
+    slow_callbacks: int
+    slow_by_source: Dict[str, int]
+    recent_slow: List[SlowCallbackDict]
+    tasks: int
+
+
+class _ConnectionMessageDict(TypedDict):
     opid: str
     opnm: str
-    opct: Dict[str, Any]
+    opct: Mapping[str, Any]
+
+
+class DispatcherInfoDict(TypedDict):
+    workers: int
+    busy: int
+    utilization: float
+    queued: int
+    inbox_size: int
+    processed: int
+    rejected: int
+    cancelled: int
+    expired: int
+
+
+class RejectReportDict(TypedDict):
+    opnm: str
+    reason: str
+
+
+class ConnectionMessageDict(_ConnectionMessageDict, total=False):
+    opts: float
+    """Unix timestamp when the message was sent"""
+    opdl: float
+    """Unix timestamp after which the message is expired"""
+    opsq: int
+    """sequence number of a report in the session"""
+    sbid: str
+    """subscription ID, only in reports pushed by subscriptions"""
+
+
+class SubscribeReportDict(TypedDict):
+    sbid: str
+    interval: float
+
+
+class ErrorReportDict(TypedDict):
+    error: str
+
+
+class BatchItemResultDict(TypedDict):
+    opnm: str
+    result: Any
+    error: Optional[str]
+
+
+class BatchReportDict(TypedDict):
+    results: List[BatchItemResultDict]
+
+
+class MatcherDumpItemDict(TypedDict):
+    id: str
+    data: Optional[Dict[str, Any]]
+    error: Optional[str]
+
+
+class MatcherDumpDict(TypedDict):
+    total: int
+    offset: int
+    matchers: List[MatcherDumpItemDict]
+
+
+class ProfileStartDict(TypedDict):
+    mode: str
+    duration: float
+    interval: float
+
+
+class ProfileFunctionDict(TypedDict):
+    function: str
+    file: str
+    line: int
+    plugin: Optional[str]
+    calls: Optional[int]
+    self: float
+    total: float
+
+
+class ProfileReportDict(TypedDict):
+    mode: str
+    elapsed: float
+    samples: Optional[int]
+    functions: List[ProfileFunctionDict]
+    plugins: Dict[str, float]
+    raw_size: int
+
+
+class ProfileRawChunkDict(TypedDict):
+    offset: int
+    total: int
+    data: str
+    eof: bool
+
+
+class MemoryTraceInfoDict(TypedDict):
+    tracing: bool
+    frames: int
+    traced: int
+    peak: int
+    overhead: int
+    snapshots: List[int]
+
+
+class MemoryStatDict(TypedDict):
+    file: Optional[str]
+    line: Optional[int]
+    plugin: Optional[str]
+    module: Optional[str]
+    size: int
+    count: int
+    size_diff: int
+    count_diff: int
+
+
+class MemorySnapshotDict(TypedDict):
+    id: int
+    timestamp: float
+    total: int
+    top: List[MemoryStatDict]
+
+
+class MemoryDiffDict(TypedDict):
+    since: int
+    to: int
+    elapsed: float
+    total_diff: int
+    top: List[MemoryStatDict]
 
 
 AllMatchTypes = Literal["startswith", "endswith", "fullmatch", "keywords", "command", "regex"]
\ No newline at end of file
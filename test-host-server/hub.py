@@ -0,0 +1,277 @@
+import asyncio
+from contextlib import suppress
+import json
+import shlex
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+from uuid import uuid4
+from websockets.exceptions import ConnectionClosed
+from websockets.server import WebSocketServerProtocol
+from models import Message
+import server
+
+
+@dataclass
+class Guest:
+    id: str
+    ws: WebSocketServerProtocol
+    codec: server.Codec
+    address: str
+    connected_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class GuestReply:
+    opct: Any = None
+    error: str | None = None
+    latency: float | None = None
+
+
+def _counts(opct: Any) -> dict[str, dict[str, int]]:
+    # full maps, or counter deltas resynced in full (see "Counter deltas" in the protocol)
+    if isinstance(opct, dict) and "version" in opct and "data" in opct:
+        if not opct.get("full"):
+            # only the changed counters, summing them is neither a total nor an increment
+            raise ValueError("counter deltas cannot be summed, query without `since`")
+        opct = opct["data"]
+    if isinstance(opct, dict) and "calls" in opct:
+        opct = _counts(opct["calls"])
+    return opct if isinstance(opct, dict) else {}
+
+
+def _sum_counts(results: list[Any]) -> dict[str, Any]:
+    by_name: dict[str, int] = {}
+    bots = 0
+    for opct in results:
+        for counts in _counts(opct).values():
+            bots += 1
+            for name, n in counts.items():
+                by_name[name] = by_name.get(name, 0) + n
+    return {"bots": bots, "total": sum(by_name.values()), "by_name": by_name}
+
+
+def _aggregate_cpu(results: list[Any]) -> dict[str, Any]:
+    percents = [x["cpu_percent"] for x in results]
+    return {
+        "cpu_percent_max": max(percents),
+        "cpu_percent_mean": sum(percents) / len(percents),
+        "load_1m_max": max(x["cpu_load"]["last1m"] for x in results),
+    }
+
+
+def _aggregate_memory(results: list[Any]) -> dict[str, Any]:
+    return {
+        "total": sum(x["mem"]["total"] for x in results),
+        "used": sum(x["mem"]["used"] for x in results),
+        "percent_max": max(x["mem"]["percent"] for x in results),
+        "swap_used": sum(x["swap"]["used"] for x in results),
+    }
+
+
+def _aggregate_time(results: list[Any]) -> dict[str, Any]:
+    uptimes = [x["nonebot"] for x in results]
+    return {"nonebot_uptime_min": min(uptimes), "nonebot_uptime_max": max(uptimes)}
+
+
+def _aggregate_bots(results: list[Any]) -> dict[str, Any]:
+    bots = [bot for x in results for bot in x]
+    return {"bots": len(bots), "distinct": len(set(bots))}
+
+
+def _aggregate_matcher_latency(results: list[Any]) -> dict[str, Any]:
+    return {
+        "matchers": sum(len(x) for x in results),
+        "runs": sum(lat["count"] for x in results for lat in x.values()),
+        "errors": sum(lat.get("errors", 0) for x in results for lat in x.values()),
+        "p99_max": max((lat["p99"] for x in results for lat in x.values()), default=None),
+    }
+
+
+AGGREGATORS: dict[str, Callable[[list[Any]], dict[str, Any]]] = {
+    "/info/recv_events": _sum_counts,
+    "/info/apicall": _sum_counts,
+    "/info/cpu": _aggregate_cpu,
+    "/info/memory": _aggregate_memory,
+    "/info/time": _aggregate_time,
+    "/info/bots": _aggregate_bots,
+    "/info/matcher_latency": _aggregate_matcher_latency,
+}
+"""How the replies of all guests to an operation are combined into one result."""
+
+
+def aggregate(opnm: str, replies: dict[str, GuestReply]) -> dict[str, Any] | None:
+    results = [x.opct for x in replies.values() if x.error is None]
+    if not results or (func := AGGREGATORS.get(opnm)) is None:
+        return None
+    try:
+        return func(results)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        return {"error": f"cannot aggregate: {e.__class__.__name__}: {e}"}
+
+
+class Hub:
+    """Every connected guest, tracked by session, and queries fanned out to them.
+
+    A query is sent to all (or the selected) guests at once, and every guest has
+    its own timeout, so a slow or dead guest only costs its own reply. Replies
+    are matched by `opid` through `server.pending`, which is a single dict lookup
+    per message however many guests are connected.
+    """
+
+    def __init__(self):
+        self.guests: dict[str, Guest] = {}
+        self.changed = asyncio.Condition()
+
+    async def attach(self, ws: WebSocketServerProtocol, codec: server.Codec, session: str | None = None):
+        """Client of `server.server_loop`, keeps the guest until it disconnects."""
+        host, port, *_ = ws.remote_address or ("?", 0)
+        id = session or f"{host}:{port}"
+        guest = Guest(id, ws, codec, f"{host}:{port}")
+        if old := self.guests.get(id):
+            # the guest reconnected (resuming its session) before the old connection closed
+            await old.ws.close()
+        async with self.changed:
+            self.guests[id] = guest
+            self.changed.notify_all()
+        try:
+            await ws.wait_closed()
+        finally:
+            async with self.changed:
+                if self.guests.get(id) is guest:
+                    del self.guests[id]
+                self.changed.notify_all()
+
+    async def wait_for(self, count: int, timeout: float | None = None):
+        async with self.changed:
+            await asyncio.wait_for(self.changed.wait_for(lambda: len(self.guests) >= count), timeout)
+
+    def select(self, targets: list[str] | None = None) -> list[Guest]:
+        """Guests by ID, or whose ID or address starts with any of `targets`."""
+        if not targets:
+            return list(self.guests.values())
+        return [
+            g for g in self.guests.values()
+            if any(g.id.startswith(x) or g.address.startswith(x) for x in targets)
+        ]
+
+    async def _ask(self, guest: Guest, opnm: str, opct: Any, timeout: float) -> GuestReply:
+        opid = str(uuid4())
+        fut: asyncio.Future[Message] = asyncio.get_running_loop().create_future()
+        server.pending[opid] = fut
+        now = time.time()
+        begin = time.perf_counter()
+        try:
+            await guest.ws.send(guest.codec.dumps(dict(
+                opid=opid, opnm=opnm, opct=opct, opts=now, opdl=now + timeout
+            )))  # type: ignore
+            reply = await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return GuestReply(error="timeout")
+        except ConnectionClosed:
+            return GuestReply(error="disconnected")
+        finally:
+            server.pending.pop(opid, None)
+        latency = time.perf_counter() - begin
+        if reply.opnm == "/event/reject":
+            reason = reply.opct.get("reason") if isinstance(reply.opct, dict) else None
+            return GuestReply(error=f"rejected: {reason}", latency=latency)
+        if isinstance(reply.opct, dict) and "error" in reply.opct and len(reply.opct) == 1:
+            return GuestReply(error=str(reply.opct["error"]), latency=latency)
+        return GuestReply(reply.opct, latency=latency)
+
+    async def query(
+        self, opnm: str, opct: Any = None, targets: list[str] | None = None, timeout: float = 5.
+    ) -> dict[str, GuestReply]:
+        """Send one operation to the selected guests at once, replies by guest ID."""
+        guests = self.select(targets)
+        replies = await asyncio.gather(
+            *(self._ask(g, opnm, {} if opct is None else opct, timeout) for g in guests)
+        )
+        return {g.id: r for g, r in zip(guests, replies)}
+
+
+def summarize(opnm: str, replies: dict[str, GuestReply], elapsed: float) -> dict[str, Any]:
+    errors: dict[str, int] = {}
+    for r in replies.values():
+        if r.error is not None:
+            errors[r.error] = errors.get(r.error, 0) + 1
+    latencies = sorted(r.latency for r in replies.values() if r.latency is not None)
+
+    def pct(q: float) -> float | None:
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e3, 3)
+
+    return {
+        "opnm": opnm,
+        "guests": len(replies),
+        "answered": sum(r.error is None for r in replies.values()),
+        "errors": errors,
+        "elapsed_ms": round(elapsed * 1e3, 3),
+        "latency_ms": {"p50": pct(.5), "p99": pct(.99), "max": pct(1.)},
+        "aggregate": aggregate(opnm, replies),
+    }
+
+
+async def run_query(
+    hub: Hub, opnm: str, opct: Any = None, targets: list[str] | None = None, timeout: float = 5.
+) -> dict[str, Any]:
+    begin = time.perf_counter()
+    replies = await hub.query(opnm, opct, targets, timeout)
+    return summarize(opnm, replies, time.perf_counter() - begin)
+
+
+HELP = """\
+guests                              list connected guests
+query OPNM [JSON [TARGET...]]       send to all guests (or those matching TARGETs) and aggregate
+show OPNM [JSON [TARGET...]]        like query, also printing every guest's reply
+timeout SECONDS                     per-guest timeout of queries
+q                                   quit"""
+
+
+async def input_loop(hub: Hub, timeout: float = 5.):
+    """Commands operating on all guests, instead of `server.input_loop` for one."""
+    print(HELP)
+    while True:
+        cmd = await asyncio.to_thread(input, "HUB>>> ")
+        try:
+            c, *param = shlex.split(cmd) or [""]
+        except ValueError as e:
+            print(f"[HUB] {e}")
+            continue
+        if not c:
+            continue
+        elif c == "q":
+            break
+        elif c == "guests":
+            for g in hub.guests.values():
+                print(f"{g.id}  {g.address}  {g.codec.name}  connected {time.time() - g.connected_at:.0f}s ago")
+            print(f"[HUB] {len(hub.guests)} guests")
+        elif c == "timeout" and len(param) == 1:
+            try:
+                timeout = float(param[0])
+            except ValueError as e:
+                print(f"[HUB] Invalid timeout: {e}")
+        elif c in ("query", "show") and param:
+            opnm, *rest = param
+            try:
+                opct = json.loads(rest[0]) if rest else {}
+            except ValueError as e:
+                print(f"[HUB] Invalid content: {e}")
+                continue
+            begin = time.perf_counter()
+            replies = await hub.query(opnm, opct, rest[1:], timeout)
+            if c == "show":
+                for id, r in replies.items():
+                    print(f"{id}: {r.error if r.error is not None else json.dumps(r.opct)}")
+            print(json.dumps(summarize(opnm, replies, time.perf_counter() - begin), indent=2))
+        else:
+            print(HELP)
+    await bye_all(hub)
+
+
+async def bye_all(hub: Hub):
+    for g in list(hub.guests.values()):
+        with suppress(ConnectionClosed):
+            await g.ws.send(g.codec.dumps(dict(opid=str(uuid4()), opnm="/greet/bye", opct={})))  # type: ignore
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any
+from uuid import uuid4
+from websockets.exceptions import ConnectionClosed
+from websockets.server import WebSocketServerProtocol
+from models import Message
+import server
+
+
+DEFAULT_MIX = [
+    "/info/time 4",
+    "/info/memory 2",
+    '/info/cpu 2 {"smptime": 0}',
+    '/info/recv_events 1 {"since": 0}',
+    "/action/matcher/list 1",
+]
+
+
+@dataclass
+class MixOp:
+    opnm: str
+    weight: float
+    opct: Any
+
+    @classmethod
+    def parse(cls, spec: str) -> "MixOp":
+        """Parse `OPNM [WEIGHT [JSON_CONTENT]]`, e.g. `/info/cpu 2 {"smptime": 0}`."""
+        opnm, *rest = spec.strip().split(maxsplit=2)
+        if not opnm.startswith("/"):
+            raise ValueError(f"operation name must start with '/': {opnm!r}")
+        weight = float(rest[0]) if rest else 1.
+        if weight <= 0:
+            raise ValueError(f"weight of {opnm!r} must be positive")
+        return cls(opnm, weight, json.loads(rest[1]) if len(rest) > 1 else {})
+
+
+@dataclass
+class OpStats:
+    sent: int = 0
+    ok: int = 0
+    errors: int = 0
+    rejected: dict[str, int] = field(default_factory=dict)
+    timeouts: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+    def percentile(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LoadGenerator:
+    """Sends a weighted mix of operations to the guest for `duration` seconds.
+
+    With `rate`, requests are sent at that fixed rate regardless of replies (open
+    loop), which shows how latency grows once the guest falls behind. Without it,
+    `concurrency` requests are kept in flight (closed loop), which shows the
+    throughput the guest can sustain.
+
+    Replies are matched to requests by `opid` (see `server.pending`). A request
+    without reply after `timeout` seconds counts as a timeout.
+    """
+
+    def __init__(
+        self,
+        mix: list[MixOp],
+        duration: float,
+        rate: float | None = None,
+        concurrency: int = 1,
+        timeout: float = 10.,
+        seed: int | None = None
+    ):
+        self.mix = mix
+        self.duration = duration
+        self.rate = rate
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.stats = {op.opnm: OpStats() for op in mix}
+        self.elapsed = 0.
+        self.done = asyncio.Event()
+        self.started = False
+        self._random = random.Random(seed)
+        self._weights = [op.weight for op in mix]
+
+    def _pick(self) -> MixOp:
+        return self._random.choices(self.mix, self._weights)[0]
+
+    async def _request(self, ws: WebSocketServerProtocol, codec: server.Codec, op: MixOp):
+        stats = self.stats[op.opnm]
+        opid = str(uuid4())
+        fut: asyncio.Future[Message] = asyncio.get_running_loop().create_future()
+        server.pending[opid] = fut
+        now = time.time()
+        begin = time.perf_counter()
+        try:
+            await ws.send(codec.dumps(dict(
+                opid=opid, opnm=op.opnm, opct=op.opct, opts=now, opdl=now + self.timeout
+            )))  # type: ignore
+            stats.sent += 1
+            reply = await asyncio.wait_for(fut, self.timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            return
+        except ConnectionClosed:
+            return
+        finally:
+            server.pending.pop(opid, None)
+        stats.latencies.append(time.perf_counter() - begin)
+        if reply.opnm == "/event/reject":
+            reason = reply.opct.get("reason", "?") if isinstance(reply.opct, dict) else "?"
+            stats.rejected[reason] = stats.rejected.get(reason, 0) + 1
+        elif isinstance(reply.opct, dict) and "error" in reply.opct:
+            stats.errors += 1
+        else:
+            stats.ok += 1
+
+    async def _closed_loop(self, ws: WebSocketServerProtocol, codec: server.Codec, until: float):
+        async def worker():
+            while time.perf_counter() < until and not ws.closed:
+                await self._request(ws, codec, self._pick())
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+    async def _open_loop(self, ws: WebSocketServerProtocol, codec: server.Codec, until: float):
+        assert self.rate
+        tasks: set[asyncio.Task] = set()
+        interval = 1 / self.rate
+        due = time.perf_counter()
+        while due < until and not ws.closed:
+            task = asyncio.create_task(self._request(ws, codec, self._pick()))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            due += interval
+            await asyncio.sleep(max(0., due - time.perf_counter()))
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def __call__(self, ws: WebSocketServerProtocol, codec: server.Codec, session: str | None = None):
+        if self.started:
+            # one run only, a second guest would mix its requests into `stats`
+            print("[LOADGEN] Already loading another guest, closing the connection")
+            await ws.close()
+            return
+        self.started = True
+        mode = f"{self.rate} req/s" if self.rate else f"concurrency {self.concurrency}"
+        print(f"[LOADGEN] Sending {len(self.mix)} operations for {self.duration}s at {mode}")
+        begin = time.perf_counter()
+        until = begin + self.duration
+        try:
+            if self.rate:
+                await self._open_loop(ws, codec, until)
+            else:
+                await self._closed_loop(ws, codec, until)
+            self.elapsed = time.perf_counter() - begin
+            if not ws.closed:
+                await ws.send(codec.dumps(dict(opid=str(uuid4()), opnm="/greet/bye", opct={})))
+        finally:
+            self.elapsed = self.elapsed or time.perf_counter() - begin
+            self.done.set()
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        def ms(x: float | None) -> float | None:
+            return None if x is None else round(x * 1e3, 3)
+
+        return {
+            opnm: {
+                "sent": st.sent,
+                "ok": st.ok,
+                "errors": st.errors,
+                "rejected": dict(st.rejected),
+                "timeouts": st.timeouts,
+                "throughput": round(len(st.latencies) / self.elapsed, 1) if self.elapsed else 0.,
+                "p50_ms": ms(st.percentile(.5)),
+                "p90_ms": ms(st.percentile(.9)),
+                "p99_ms": ms(st.percentile(.99)),
+                "max_ms": ms(max(st.latencies, default=None)),
+            }
+            for opnm, st in self.stats.items()
+        }
+
+    def report(self) -> str:
+        header = ("operation", "sent", "ok", "error", "reject", "timeout", "req/s", "p50", "p90", "p99", "max")
+        rows = [header]
+        for opnm, st in self.summary().items():
+            rows.append((
+                opnm, st["sent"], st["ok"], st["errors"], sum(st["rejected"].values()), st["timeouts"],
+                st["throughput"], st["p50_ms"], st["p90_ms"], st["p99_ms"], st["max_ms"]
+            ))
+        widths = [max(len(str(row[i])) for row in rows) for i in range(len(header))]
+        lines = [
+            "  ".join(
+                str(x).ljust(w) if i == 0 else str(x).rjust(w)
+                for i, (x, w) in enumerate(zip(row, widths))
+            )
+            for row in rows
+        ]
+        lines.insert(1, "-" * len(lines[0]))
+        lines.append(f"(latencies in ms, {self.elapsed:.1f}s)")
+        return "\n".join(lines)
@@ -1,8 +1,12 @@
 import asyncio
 from contextlib import suppress
 from ipaddress import AddressValueError, IPv4Address, IPv6Address
+import json
 import click
+import hub
+import loadgen
 import server
+import simguest
 
 def addr_validate(ctx, param, value) -> IPv4Address | IPv6Address:
     with suppress(AddressValueError):
@@ -12,13 +16,113 @@ def addr_validate(ctx, param, value) -> IPv4Address | IPv6Address:
     raise click.BadParameter(f"{value!r} is not an IPv4 or IPv6 address", ctx, param)
 
 
+def mix_validate(ctx, param, value) -> list[loadgen.MixOp]:
+    try:
+        return [loadgen.MixOp.parse(x) for x in value or loadgen.DEFAULT_MIX]
+    except ValueError as e:
+        raise click.BadParameter(str(e), ctx, param)
+
+
+def query_validate(ctx, param, value) -> list[tuple[str, object]]:
+    queries = []
+    for spec in value:
+        opnm, *rest = spec.strip().split(maxsplit=1)
+        try:
+            queries.append((opnm, json.loads(rest[0]) if rest else {}))
+        except ValueError as e:
+            raise click.BadParameter(f"invalid content of {opnm!r}: {e}", ctx, param)
+    return queries
+
+
 @click.command()
 @click.option("--host", "-H", nargs=1, default="127.0.0.1", callback=addr_validate)
 @click.option("--port", "-P", nargs=1, default=37103, type=click.IntRange(1, 65535))
-def main(host: IPv4Address | IPv6Address, port: int):
-    print(f"[HOST] Running test host server at {host=}, {port=}")
-    asyncio.run(server.run(str(host), port))
+@click.option("--encoding", "-E", default="auto", type=click.Choice(["auto", *server.CODECS]))
+@click.option("--load", "-L", is_flag=True, help="Load the first guest instead of reading commands.")
+@click.option(
+    "--op", "-O", "mix", multiple=True, callback=mix_validate,
+    help='Operation of the load mix as `OPNM [WEIGHT [JSON_CONTENT]]`, repeatable.'
+)
+@click.option("--rate", "-r", type=click.FloatRange(0, min_open=True), help="Requests per second (open loop).")
+@click.option("--concurrency", "-c", default=8, type=click.IntRange(1), help="Requests in flight without --rate.")
+@click.option("--duration", "-d", default=10., type=click.FloatRange(0, min_open=True))
+@click.option("--timeout", "-t", default=10., type=click.FloatRange(0, min_open=True))
+@click.option("--json", "as_json", is_flag=True, help="Print the load summary as JSON.")
+@click.option("--hub", "hub_mode", is_flag=True, help="Keep every guest and query them together.")
+@click.option(
+    "--query", "-Q", "queries", multiple=True, callback=query_validate,
+    help="Query `OPNM [JSON_CONTENT]` on all guests and exit instead of reading commands, repeatable."
+)
+@click.option("--guests", "-g", default=1, type=click.IntRange(1), help="Guests to wait for before --query.")
+@click.option("--rounds", default=1, type=click.IntRange(1), help="Times every --query is sent.")
+@click.option("--simulate", "-S", default=0, type=click.IntRange(0), help="Simulated guests to connect.")
+@click.option("--seed", default=0, type=int, help="Seed of the simulated guests.")
+def main(
+    host: IPv4Address | IPv6Address,
+    port: int,
+    encoding: str,
+    load: bool,
+    mix: list[loadgen.MixOp],
+    rate: float | None,
+    concurrency: int,
+    duration: float,
+    timeout: float,
+    as_json: bool,
+    hub_mode: bool,
+    queries: list[tuple[str, object]],
+    guests: int,
+    rounds: int,
+    simulate: int,
+    seed: int
+):
+    print(f"[HOST] Running test host server at {host=}, {port=}, {encoding=}")
+    if hub_mode:
+        asyncio.run(run_hub(str(host), port, encoding, timeout, queries, guests, rounds, simulate, seed))
+        return
+    if not load:
+        asyncio.run(server.run(str(host), port, encoding))
+        return
+
+    async def run_load() -> loadgen.LoadGenerator:
+        gen = loadgen.LoadGenerator(mix, duration, rate, concurrency, timeout)
+        await server.run(str(host), port, encoding, gen, gen.done.wait())
+        return gen
+
+    gen = asyncio.run(run_load())
+    print(json.dumps(gen.summary(), indent=2) if as_json else gen.report())
+
+
+async def run_hub(
+    host: str,
+    port: int,
+    encoding: str,
+    timeout: float,
+    queries: list[tuple[str, object]],
+    guests: int,
+    rounds: int,
+    simulate: int,
+    seed: int
+):
+    guest_hub = hub.Hub()
+
+    async def operate():
+        if simulate:
+            url = f"ws://{f'[{host}]' if ':' in host else host}:{port}"
+            sim = asyncio.create_task(simguest.simulate(url, simulate, seed))
+        if not queries:
+            await hub.input_loop(guest_hub, timeout)
+        else:
+            await guest_hub.wait_for(max(guests, simulate))
+            print(f"[HUB] {len(guest_hub.guests)} guests connected")
+            for _ in range(rounds):
+                for opnm, opct in queries:
+                    print(json.dumps(await hub.run_query(guest_hub, opnm, opct, timeout=timeout), indent=2))
+            await hub.bye_all(guest_hub)
+        if simulate:
+            await sim
+
+    await server.run(host, port, encoding, guest_hub.attach, operate())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
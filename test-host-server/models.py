@@ -6,6 +6,10 @@ class Message(BaseModel):
     opid: UUID4
     opnm: str
     opct: str | int | float | bool | list[Any] | dict[str, Any] | None
+    opts: float | None = None
+    opdl: float | None = None
+    opsq: int | None = None
+    sbid: UUID4 | None = None
 
 
 class GreetMessage(Message):
@@ -15,7 +19,9 @@ class GreetMessage(Message):
 class InfoMessage(Message):
     opnm: Literal[
         "/info/python_version", "/info/cpu", "/info/memory",
-        "/info/all_partitions", "/info/all_disk_io", "/info/all_network_io",
+        "/info/all_partitions", "/info/all_disk_io", "/info/all_network_io", "/info/metrics_history",
         "/info/processes", "/info/system_platform", "/info/time",
-        "/info/bots", "/info/bots_connect_time", "/info/recv_events", "/info/apicall"
+        "/info/bots", "/info/bots_connect_time", "/info/recv_events", "/info/apicall",
+        "/info/matcher_latency", "/info/routing", "/info/coalesce",
+        "/info/dispatcher", "/info/event_loop"
     ]
\ No newline at end of file
@@ -1,14 +1,64 @@
 import asyncio
 import json
 import shlex
+import time
+from typing import Any, Awaitable, Callable, NamedTuple
 from uuid import uuid4
 from pydantic import ValidationError
 import websockets
+from websockets.exceptions import ConnectionClosed
 from websockets.server import WebSocketServerProtocol
 from models import GreetMessage, Message
 
 
-async def input_loop(ws: WebSocketServerProtocol):
+class Codec(NamedTuple):
+    name: str
+    dumps: Callable[[Any], str | bytes]
+    loads: Callable[[str | bytes], Any]
+
+
+CODECS: dict[str, Codec] = {"json": Codec("json", json.dumps, json.loads)}
+
+try:
+    import msgpack
+    CODECS["msgpack"] = Codec(
+        "msgpack",
+        lambda obj: msgpack.packb(obj, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False)
+    )
+except ImportError:
+    pass
+
+try:
+    import cbor2
+    CODECS["cbor"] = Codec("cbor", cbor2.dumps, cbor2.loads)
+except ImportError:
+    pass
+
+
+sessions: dict[str, int] = {}
+"""Last received report sequence number of every known guest session."""
+
+pending: dict[str, asyncio.Future[Message]] = {}
+"""Requests waiting for their reply, by `opid`. Their replies are not printed."""
+
+Client = Callable[[WebSocketServerProtocol, "Codec", str | None], Awaitable[None]]
+"""Talks to a guest after the greeting, given the connection, its codec and session."""
+
+
+def pick_codec(offered: Any, preferred: str) -> Codec:
+    if not isinstance(offered, list):
+        return CODECS["json"]
+    if preferred != "auto":
+        return CODECS[preferred] if preferred in offered else CODECS["json"]
+    return next((CODECS[x] for x in offered if x in CODECS), CODECS["json"])
+
+
+def decode(codec: Codec, data: str | bytes) -> Any:
+    return json.loads(data) if isinstance(data, str) else codec.loads(data)
+
+
+async def input_loop(ws: WebSocketServerProtocol, codec: Codec, session: str | None = None):
     cmd = ""
     while not ws.closed:
         c, param = "", []
@@ -25,12 +75,14 @@ async def input_loop(ws: WebSocketServerProtocol):
         else:
             onm, prm = param
             if c == "info":
-                await ws.send(json.dumps(dict(opid=str(uuid4()), opnm=f"/info/{onm}", opct=json.loads(prm))))  # type: ignore
+                await ws.send(codec.dumps(dict(opid=str(uuid4()), opnm=f"/info/{onm}", opct=json.loads(prm), opts=time.time())))  # type: ignore
         cmd = await asyncio.to_thread(input, "HOST>>> ")
-    await ws.send(json.dumps(dict(opid=str(uuid4()), opnm="/greet/bye", opct={})))
+    await ws.send(codec.dumps(dict(opid=str(uuid4()), opnm="/greet/bye", opct={})))
 
 
-async def server_loop(websocket: WebSocketServerProtocol):
+async def server_loop(
+    websocket: WebSocketServerProtocol, encoding: str = "auto", client: Client = input_loop
+):
     data = await websocket.recv()
     try:
         xdata = Message(**json.loads(data))
@@ -41,15 +93,41 @@ async def server_loop(websocket: WebSocketServerProtocol):
         await websocket.close()
         return
 
-    await websocket.send(data)
+    session = None
+    if isinstance(xdata.opct, dict) and "encodings" in xdata.opct:
+        codec = pick_codec(xdata.opct["encodings"], encoding)
+        reply: dict = {"encoding": codec.name}
+        if session := xdata.opct.get("session"):
+            if session in sessions:
+                reply |= {"session": session, "ack": sessions[session]}
+                print(f"[GREET] Resuming session {session} after report #{sessions[session]}")
+            else:
+                sessions[session] = xdata.opct.get("seq", 0)
+        await websocket.send(json.dumps(dict(opid=str(xdata.opid), opnm="/greet/hello", opct=reply)))
+    else:
+        # guests without encoding negotiation expect their hello echoed back
+        codec = CODECS["json"]
+        await websocket.send(data)
+    print(f"[GREET] Using {codec.name!r} encoding")
 
-    task = asyncio.create_task(input_loop(websocket))
+    task = asyncio.create_task(client(websocket, codec, session))
 
     while websocket.open:
-        data = await websocket.recv()
-        xdata = Message(**json.loads(data))
-        print(f"[SERVERLOOP] Received data {xdata!r}")
+        try:
+            data = await websocket.recv()
+        except ConnectionClosed:
+            # e.g. the server shutting down after a load run
+            break
+        xdata = Message(**decode(codec, data))
+        if session and xdata.opsq:
+            sessions[session] = max(sessions[session], xdata.opsq)
+        if fut := pending.pop(str(xdata.opid), None):
+            if not fut.done():
+                fut.set_result(xdata)
+            continue
+        print(f"[SERVERLOOP] Received data {xdata!r} ({len(data)} bytes)")
         if xdata.opnm == "/greet/bye":
+            sessions.pop(session, None)
             await websocket.close()
         # resp = ""
         # await websocket.send(resp)
@@ -57,6 +135,12 @@ async def server_loop(websocket: WebSocketServerProtocol):
     await task
 
 
-async def run(host: str, port: int):
-    async with websockets.serve(server_loop, host, port):  # type: ignore
-        await asyncio.Future()  # run forever
\ No newline at end of file
+async def run(
+    host: str,
+    port: int,
+    encoding: str = "auto",
+    client: Client = input_loop,
+    until: Awaitable[Any] | None = None
+):
+    async with websockets.serve(lambda ws: server_loop(ws, encoding, client), host, port):  # type: ignore
+        await (until or asyncio.Future())  # run forever by default
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import random
+import time
+from typing import Any
+from uuid import UUID, uuid4
+import click
+import websockets
+from websockets.exceptions import ConnectionClosed
+import server
+
+
+class SimulatedGuest:
+    """A guest answering info operations with made-up but plausible data.
+
+    Everything random is drawn from a generator seeded by `seed` and `index`, so
+    a run with the same arguments produces the same guests, data and delays.
+    A `slow` guest takes `slow_delay` seconds to answer, to exercise timeouts.
+    """
+
+    def __init__(
+        self, url: str, index: int, seed: int, delay: float, jitter: float, slow: bool, slow_delay: float
+    ):
+        self.url = url
+        self.index = index
+        self.random = random.Random(f"{seed}:{index}")
+        self.session = str(UUID(int=self.random.getrandbits(128), version=4))
+        self.delay = slow_delay if slow else delay
+        self.jitter = jitter
+        self.bots = [str(10000 + index * 10 + i) for i in range(1 + index % 3)]
+        self.started = time.time() - self.random.uniform(60, 86400)
+        self.events = {bot: self.random.randrange(1000) for bot in self.bots}
+        self.seq = 0
+
+    def _answer(self, opnm: str, opct: Any) -> Any:
+        rnd = self.random
+        for bot in self.bots:
+            self.events[bot] += rnd.randrange(20)
+        match opnm:
+            case "/info/time":
+                now = time.time()
+                return {"system": now - self.started + 60, "nonebot": now - self.started,
+                        "system_ts": self.started - 60, "nonebot_ts": self.started}
+            case "/info/cpu":
+                return {"cpu_percent": round(rnd.uniform(0, 100), 1),
+                        "cpu_ncores": {"physical": 4, "logical": 8},
+                        "cpu_freq": {"current": 2400., "min": 800., "max": 4800.},
+                        "cpu_load": {"last1m": round(rnd.uniform(0, 4), 2), "last5m": 1., "last15m": 1.}}
+            case "/info/memory":
+                total = 8 << 30
+                used = rnd.randrange(total // 8, total)
+                return {"mem": {"total": total, "available": total - used, "used": used,
+                                "percent": round(used / total * 100, 1)},
+                        "swap": {"total": 1 << 30, "available": 1 << 30, "used": 0, "percent": 0.}}
+            case "/info/bots":
+                return self.bots
+            case "/info/recv_events":
+                data = {bot: {"GroupMessageEvent": n, "HeartbeatMetaEvent": n // 2}
+                        for bot, n in self.events.items()}
+                if isinstance(opct, dict) and opct.get("since") is not None:
+                    return {"version": int(time.time() * 1e6), "full": True, "data": data}
+                return data
+            case "/info/python_version":
+                return {"version_string": "3.11.7", "version_info": {
+                    "major": 3, "minor": 11, "micro": 7, "release_level": "final", "serial": 0}}
+        return {"error": "unknown info type"}
+
+    async def _reply(self, ws: Any, codec: server.Codec, data: dict):
+        await asyncio.sleep(self.delay + self.random.uniform(0, self.jitter))
+        self.seq += 1
+        report = dict(
+            opid=data["opid"], opnm=f"/event/report/{data['opnm'].split('/')[1]}",
+            opct=self._answer(data["opnm"], data.get("opct")), opsq=self.seq
+        )
+        try:
+            await ws.send(codec.dumps(report))
+        except ConnectionClosed:
+            pass
+
+    async def run(self):
+        async with websockets.connect(self.url) as ws:  # type: ignore
+            opid = str(uuid4())
+            await ws.send(json.dumps(dict(opid=opid, opnm="/greet/hello", opct={
+                "encodings": list(server.CODECS), "session": self.session, "seq": self.seq
+            })))
+            hello = json.loads(await ws.recv())
+            codec = server.CODECS.get(hello["opct"].get("encoding"), server.CODECS["json"])
+            tasks: set[asyncio.Task] = set()
+            async for frame in ws:
+                data = server.decode(codec, frame)
+                if data["opnm"] == "/greet/bye":
+                    break
+                task = asyncio.create_task(self._reply(ws, codec, data))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            for task in tasks:
+                task.cancel()
+
+
+async def simulate(
+    url: str,
+    count: int,
+    seed: int = 0,
+    delay: float = .005,
+    jitter: float = .01,
+    slow_ratio: float = 0.,
+    slow_delay: float = 30.,
+):
+    """Connect `count` simulated guests to the host at `url` until they are told bye."""
+    rnd = random.Random(seed)
+    guests = [
+        SimulatedGuest(url, i, seed, delay, jitter, rnd.random() < slow_ratio, slow_delay)
+        for i in range(count)
+    ]
+    results = await asyncio.gather(*(g.run() for g in guests), return_exceptions=True)
+    failed = [r for r in results if isinstance(r, BaseException)]
+    if failed:
+        print(f"[SIMGUEST] {len(failed)} guests failed, e.g. {failed[0]!r}")
+
+
+@click.command()
+@click.option("--url", "-u", default="ws://127.0.0.1:37103")
+@click.option("--count", "-n", default=100, type=click.IntRange(1))
+@click.option("--seed", "-s", default=0, type=int)
+@click.option("--delay", default=.005, type=click.FloatRange(0), help="Seconds before answering.")
+@click.option("--jitter", default=.01, type=click.FloatRange(0), help="Random extra delay, at most.")
+@click.option("--slow-ratio", default=0., type=click.FloatRange(0, 1), help="Share of slow guests.")
+@click.option("--slow-delay", default=30., type=click.FloatRange(0), help="Answer delay of slow guests.")
+def main(url: str, count: int, seed: int, delay: float, jitter: float, slow_ratio: float, slow_delay: float):
+    print(f"[SIMGUEST] Connecting {count} simulated guests to {url} ({seed=})")
+    asyncio.run(simulate(url, count, seed, delay, jitter, slow_ratio, slow_delay))
+
+
+if __name__ == "__main__":
+    main()